@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Latency/throughput benchmark for the MCP server
+
+Starts the local Apify stand-in (fake_apify.py) and the MCP server on HTTP, then
+drives the /mcp endpoint with N concurrent clients and reports p50/p95/p99 latency,
+throughput, errors and server RSS for each tool. Pass --url to benchmark a server
+that is already running instead.
+
+    uv run benchmark.py --clients 20 --requests 200
+"""
+
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import click
+from fastmcp import Client
+
+TOOLS = {
+    "twitter": ("scrape_twitter_handles", "twitterHandle"),
+    "linkedin": ("scrape_linkedin_profile", "username"),
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def read_rss_mb(pid: Optional[int]) -> dict:
+    """Current and peak resident memory of a process in MB (Linux only)."""
+    if pid is None:
+        return {}
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return {}
+    return {
+        "rss_mb": round(int(fields["VmRSS"].split()[0]) / 1024, 1),
+        "peak_rss_mb": round(int(fields["VmHWM"].split()[0]) / 1024, 1),
+    }
+
+
+def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                return
+        time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+async def run_tool(url: str, tool: str, clients: int, requests: int, unique: bool) -> dict:
+    """Fire requests at one tool from concurrent clients and collect latency stats."""
+    tool_name, arg_name = TOOLS[tool]
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(f"bench-user-{i}" if unique else "bench-user")
+    latencies = []
+    errors = 0
+    response_bytes = 0
+
+    async def worker() -> None:
+        nonlocal errors, response_bytes
+        async with Client(url) as client:
+            while True:
+                try:
+                    identifier = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                started = time.perf_counter()
+                try:
+                    result = await client.call_tool(tool_name, {arg_name: identifier})
+                    text = result.content[0].text
+                    response_bytes += len(text.encode("utf-8"))
+                    if "error" in json.loads(text):
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        "tool": tool_name,
+        "requests": requests,
+        "clients": clients,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "avg_response_bytes": round(response_bytes / max(1, len(latencies))),
+    }
+
+
+@click.command()
+@click.option("--url", default=None, help="Benchmark an already running server (e.g. http://localhost:8000/mcp)")
+@click.option("--tool", type=click.Choice(["twitter", "linkedin", "both"]), default="both", show_default=True)
+@click.option("--clients", default=10, show_default=True, help="Concurrent MCP clients")
+@click.option("--requests", default=100, show_default=True, help="Requests per tool")
+@click.option("--unique/--repeat", default=True, show_default=True,
+              help="Use a distinct handle per request, or the same one (exercises cache and dedup)")
+@click.option("--port", default=8100, show_default=True, help="Port for the spawned MCP server")
+@click.option("--apify-port", default=8765, show_default=True, help="Port for the spawned Apify stand-in")
+@click.option("--run-latency", default=1.0, show_default=True, help="Fake actor run duration in seconds")
+@click.option("--dataset-size", default=20, show_default=True, help="Fake items per handle / profile")
+@click.option("--error-rate", default=0.0, show_default=True, help="Fraction of fake API requests that fail")
+@click.option("--fail-p95", default=None, type=float, help="Exit non-zero if any tool's p95 exceeds this (ms)")
+@click.option("--json", "as_json", is_flag=True, help="Print results as JSON")
+def main(url, tool, clients, requests, unique, port, apify_port, run_latency, dataset_size, error_rate,
+         fail_p95, as_json):
+    """Benchmark the MCP server tools."""
+    processes = []
+    server_pid = None
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        if url is None:
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(here, "fake_apify.py"), "--port", str(apify_port),
+                 "--run-latency", str(run_latency), "--dataset-size", str(dataset_size),
+                 "--error-rate", str(error_rate)],
+                stdout=subprocess.DEVNULL,
+            ))
+            env = dict(
+                os.environ,
+                APIFY_API_TOKEN="fake-token",
+                APIFY_API_URL=f"http://127.0.0.1:{apify_port}",
+                CACHE_DB_PATH="",
+                JOBS_DB_PATH="",
+                WANDB_API_KEY="",
+                PORT=str(port),
+            )
+            server = subprocess.Popen([sys.executable, os.path.join(here, "main.py")], env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            processes.append(server)
+            server_pid = server.pid
+            wait_for_port(apify_port)
+            wait_for_port(port)
+            url = f"http://127.0.0.1:{port}/mcp"
+
+        results = []
+        for name in (["twitter", "linkedin"] if tool == "both" else [tool]):
+            stats = asyncio.run(run_tool(url, name, clients, requests, unique))
+            stats.update(read_rss_mb(server_pid))
+            results.append(stats)
+            if not as_json:
+                print(f"📊 {stats['tool']}: p50 {stats['p50_ms']}ms | p95 {stats['p95_ms']}ms | "
+                      f"p99 {stats['p99_ms']}ms | {stats['throughput_rps']} req/s | "
+                      f"{stats['errors']}/{stats['requests']} errors | "
+                      f"RSS {stats.get('rss_mb', 'n/a')}MB (peak {stats.get('peak_rss_mb', 'n/a')}MB)")
+
+        if as_json:
+            print(json.dumps(results, indent=2))
+
+        if fail_p95 is not None and any(stats["p95_ms"] > fail_p95 for stats in results):
+            print(f"❌ p95 latency above {fail_p95}ms", file=sys.stderr)
+            sys.exit(1)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Local Apify stand-in
+
+Serves the subset of the Apify HTTP API used by the MCP server (actor runs, run
+status/abort and dataset items) so the server can be exercised and benchmarked
+without live services. Run latency, dataset size and error rates are configurable,
+and real responses can be recorded once and replayed afterwards.
+
+Point the MCP server at it with APIFY_API_URL=http://127.0.0.1:8765
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import random
+import time
+import uuid
+from typing import Optional
+
+import click
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, Response
+from starlette.routing import Route
+
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
+
+
+class FakeApify:
+    """In-memory actor runs and datasets with configurable latency and failures."""
+
+    def __init__(self, run_latency: float = 1.0, latency_jitter: float = 0.3, dataset_size: int = 20,
+                 error_rate: float = 0.0, fail_rate: float = 0.0, retweet_rate: float = 0.3,
+                 record_path: Optional[str] = None, replay_path: Optional[str] = None,
+                 upstream_url: str = "https://api.apify.com"):
+        self.run_latency = run_latency
+        self.latency_jitter = latency_jitter
+        self.dataset_size = dataset_size
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.retweet_rate = retweet_rate
+        self.record_path = record_path
+        self.upstream_url = upstream_url
+        self.runs = {}
+        self.datasets = {}
+        self.recordings = {}
+        if replay_path:
+            with open(replay_path, encoding="utf-8") as f:
+                self.recordings = json.load(f)
+            print(f"📼 Replaying {len(self.recordings)} recorded runs from {replay_path}")
+
+    # Runs
+
+    def start_run(self, actor_id: str, run_input: dict, items: Optional[list] = None,
+                  options: Optional[dict] = None) -> dict:
+        run_id = uuid.uuid4().hex[:17]
+        latency = self.run_latency * random.uniform(1 - self.latency_jitter, 1 + self.latency_jitter)
+        if items is None:
+            items = self.recordings.get(recording_key(actor_id, run_input))
+        if items is None:
+            items = generate_items(actor_id, run_input, self.dataset_size, self.retweet_rate)
+        self.datasets[run_id] = items
+        self.runs[run_id] = {
+            "id": run_id,
+            "actId": actor_id,
+            "status": "RUNNING",
+            "startedAt": now_iso(),
+            "finishedAt": None,
+            "defaultDatasetId": run_id,
+            "options": options or {},
+            "_finish_at": time.monotonic() + latency,
+            "_final_status": "FAILED" if random.random() < self.fail_rate else "SUCCEEDED",
+        }
+        return self.run_view(run_id)
+
+    def run_view(self, run_id: str) -> Optional[dict]:
+        run = self.runs.get(run_id)
+        if run is None:
+            return None
+        if run["status"] not in TERMINAL_STATUSES and time.monotonic() >= run["_finish_at"]:
+            run["status"] = run["_final_status"]
+            run["finishedAt"] = now_iso()
+        return {key: value for key, value in run.items() if not key.startswith("_")}
+
+    async def wait_for_run(self, run_id: str, wait_secs: float) -> Optional[dict]:
+        deadline = time.monotonic() + wait_secs
+        while True:
+            run = self.run_view(run_id)
+            if run is None or run["status"] in TERMINAL_STATUSES:
+                return run
+            remaining = min(deadline, self.runs[run_id]["_finish_at"]) - time.monotonic()
+            if remaining <= 0:
+                return run
+            await asyncio.sleep(min(remaining, 0.05))
+
+    def abort_run(self, run_id: str) -> Optional[dict]:
+        run = self.runs.get(run_id)
+        if run is None:
+            return None
+        if self.run_view(run_id)["status"] not in TERMINAL_STATUSES:
+            run["status"] = "ABORTED"
+            run["finishedAt"] = now_iso()
+        return self.run_view(run_id)
+
+    # Recording
+
+    async def record_run(self, actor_id: str, run_input: dict, token: str) -> list:
+        """Run the real actor upstream, save its dataset and return the items."""
+        from apify_client import ApifyClientAsync
+
+        upstream = ApifyClientAsync(token, api_url=self.upstream_url)
+        run = await upstream.actor(actor_id).call(run_input=run_input, logger=None)
+        items = [item async for item in upstream.dataset(run["defaultDatasetId"]).iterate_items()]
+        self.recordings[recording_key(actor_id, run_input)] = items
+        with open(self.record_path, "w", encoding="utf-8") as f:
+            json.dump(self.recordings, f, ensure_ascii=False, indent=2)
+        print(f"📼 Recorded {len(items)} items for {actor_id}")
+        return items
+
+
+def now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+def recording_key(actor_id: str, run_input: dict) -> str:
+    return f"{actor_id} {json.dumps(run_input, sort_keys=True, ensure_ascii=False)}"
+
+
+def generate_items(actor_id: str, run_input: dict, dataset_size: int, retweet_rate: float) -> list:
+    """Synthesize dataset items shaped like the real tweet-scraper / linkedin-profile-posts output."""
+    if "linkedin" in actor_id:
+        username = run_input.get("username", "someone")
+        count = min(dataset_size, run_input.get("total_posts") or run_input.get("limit") or dataset_size)
+        return [
+            {
+                "text": f"Post #{i} by {username}: shipping things and learning along the way. " * 3,
+                "url": f"https://www.linkedin.com/posts/{username}_{i}",
+                "post_type": "regular",
+                "posted_at": {
+                    "date": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(time.time() - i * 86400)),
+                    "relative": f"{i}d",
+                    "timestamp": int((time.time() - i * 86400) * 1000),
+                },
+                "author": {
+                    "first_name": username.split("-")[0].title(),
+                    "last_name": username.split("-")[-1].title(),
+                    "headline": "Builder",
+                    "username": username,
+                    "profile_url": f"https://www.linkedin.com/in/{username}",
+                },
+                "stats": {
+                    "total_reactions": random.randint(0, 500),
+                    "like": random.randint(0, 400),
+                    "celebrate": random.randint(0, 50),
+                    "support": random.randint(0, 20),
+                    "comments": random.randint(0, 80),
+                    "reposts": random.randint(0, 30),
+                },
+            }
+            for i in range(count)
+        ]
+
+    items = []
+    for handle in run_input.get("twitterHandles", []):
+        for i in range(dataset_size):
+            tweet_id = random.randint(10**17, 10**18)
+            items.append({
+                "id": str(tweet_id),
+                "text": f"Tweet #{i} from @{handle} about building in public",
+                "url": f"https://x.com/{handle}/status/{tweet_id}",
+                "createdAt": time.strftime("%a %b %d %H:%M:%S +0000 %Y", time.gmtime(time.time() - i * 3600)),
+                "likeCount": random.randint(0, 1000),
+                "retweetCount": random.randint(0, 200),
+                "isRetweet": random.random() < retweet_rate,
+                "author": {"userName": handle, "name": handle.title()},
+            })
+    return items
+
+
+def create_app(fake: FakeApify) -> Starlette:
+    """Build the Starlette app exposing the fake Apify endpoints under /v2."""
+
+    def maybe_fail() -> Optional[Response]:
+        if fake.error_rate and random.random() < fake.error_rate:
+            return JSONResponse({"error": {"type": "internal-error", "message": "Injected failure"}}, status_code=503)
+        return None
+
+    def not_found() -> Response:
+        return JSONResponse({"error": {"type": "record-not-found", "message": "Run was not found"}}, status_code=404)
+
+    async def get_actor(request: Request) -> Response:
+        username, _, name = request.path_params["actor_id"].partition("~")
+        return JSONResponse({"data": {"id": request.path_params["actor_id"], "username": username, "name": name}})
+
+    async def start_run(request: Request) -> Response:
+        if (failure := maybe_fail()) is not None:
+            return failure
+        actor_id = request.path_params["actor_id"].replace("~", "/")
+        body = await request.body()
+        if request.headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        run_input = json.loads(body) if body else {}
+        options = {key: request.query_params[key] for key in ("timeout", "memory", "build") if key in request.query_params}
+        items = None
+        if fake.record_path and recording_key(actor_id, run_input) not in fake.recordings:
+            token = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+            items = await fake.record_run(actor_id, run_input, token)
+        run = fake.start_run(actor_id, run_input, items, options)
+        wait_secs = float(request.query_params.get("waitForFinish", 0) or 0)
+        if wait_secs:
+            run = await fake.wait_for_run(run["id"], wait_secs)
+        return JSONResponse({"data": run}, status_code=201)
+
+    async def get_run(request: Request) -> Response:
+        if (failure := maybe_fail()) is not None:
+            return failure
+        run_id = request.path_params["run_id"]
+        wait_secs = float(request.query_params.get("waitForFinish", 0) or 0)
+        run = await fake.wait_for_run(run_id, wait_secs) if wait_secs else fake.run_view(run_id)
+        return JSONResponse({"data": run}) if run else not_found()
+
+    async def abort_run(request: Request) -> Response:
+        run = fake.abort_run(request.path_params["run_id"])
+        return JSONResponse({"data": run}) if run else not_found()
+
+    async def run_log(request: Request) -> Response:
+        return PlainTextResponse("")
+
+    async def dataset_items(request: Request) -> Response:
+        if (failure := maybe_fail()) is not None:
+            return failure
+        items = fake.datasets.get(request.path_params["dataset_id"])
+        if items is None:
+            return JSONResponse({"error": {"type": "record-not-found", "message": "Dataset was not found"}},
+                                status_code=404)
+        if request.query_params.get("desc") in ("1", "true"):
+            items = items[::-1]
+        offset = int(request.query_params.get("offset", 0) or 0)
+        limit = int(request.query_params.get("limit", 0) or 0) or 999999999999
+        page = items[offset:offset + limit]
+        fields = [field for field in request.query_params.get("fields", "").split(",") if field]
+        if fields:
+            page = [{field: item[field] for field in fields if field in item} for item in page]
+        headers = {
+            "x-apify-pagination-total": str(len(items)),
+            "x-apify-pagination-offset": str(offset),
+            "x-apify-pagination-limit": str(limit),
+            "x-apify-pagination-count": str(len(page)),
+            "x-apify-pagination-desc": "true" if request.query_params.get("desc") in ("1", "true") else "",
+        }
+        return JSONResponse(page, headers=headers)
+
+    return Starlette(routes=[
+        Route("/v2/acts/{actor_id}", get_actor, methods=["GET"]),
+        Route("/v2/acts/{actor_id}/runs", start_run, methods=["POST"]),
+        Route("/v2/actor-runs/{run_id}", get_run, methods=["GET"]),
+        Route("/v2/actor-runs/{run_id}/abort", abort_run, methods=["POST"]),
+        Route("/v2/actor-runs/{run_id}/log", run_log, methods=["GET"]),
+        Route("/v2/datasets/{dataset_id}/items", dataset_items, methods=["GET"]),
+    ])
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=8765, show_default=True)
+@click.option("--run-latency", default=1.0, show_default=True, help="Mean actor run duration in seconds")
+@click.option("--latency-jitter", default=0.3, show_default=True, help="Relative +/- jitter applied to run latency")
+@click.option("--dataset-size", default=20, show_default=True, help="Items per handle / profile")
+@click.option("--error-rate", default=0.0, show_default=True, help="Fraction of API requests answered with a 503")
+@click.option("--fail-rate", default=0.0, show_default=True, help="Fraction of actor runs that end FAILED")
+@click.option("--retweet-rate", default=0.3, show_default=True, help="Fraction of synthetic tweets marked as retweets")
+@click.option("--record", "record_path", default=None, help="Proxy unseen runs to the real Apify API and save them here")
+@click.option("--replay", "replay_path", default=None, help="Serve datasets recorded with --record")
+def main(host, port, run_latency, latency_jitter, dataset_size, error_rate, fail_rate, retweet_rate,
+         record_path, replay_path):
+    """Run the local Apify stand-in."""
+    if record_path and not replay_path:
+        replay_path = record_path if os.path.exists(record_path) else None
+    fake = FakeApify(run_latency, latency_jitter, dataset_size, error_rate, fail_rate, retweet_rate,
+                     record_path, replay_path)
+    print(f"🧪 Fake Apify API listening on http://{host}:{port} (run latency ~{run_latency}s)")
+    uvicorn.run(create_app(fake), host=host, port=port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
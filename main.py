@@ -10,40 +10,2474 @@ import os
 import json
 import sys
 import time
-from typing import List, Union, Optional
-from datetime import datetime
+import asyncio
+import atexit
+import contextvars
+import functools
+import hashlib
+import heapq
+import inspect
+import logging
+import math
+import queue
+import random
+import re
+import sqlite3
+import subprocess
+import threading
+import uuid
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import TYPE_CHECKING, List, Union, Optional
+from datetime import datetime, timezone
 from dotenv import load_dotenv
-from apify_client import ApifyClient
-from fastmcp import FastMCP
-import weave
+from fastmcp import FastMCP, Context
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
+
+try:
+    import orjson  # Optional faster JSON encoder for compact responses
+except ImportError:
+    orjson = None
+
+if TYPE_CHECKING:
+    from apify_client import ApifyClientAsync
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Weave tracking
-WANDB_API_KEY = os.getenv("WANDB_API_KEY")
-if WANDB_API_KEY:
-    os.environ["WANDB_API_KEY"] = WANDB_API_KEY
-    weave.init('mcp-social-outreach')
-    print("🐝 Weave tracking initialized")
-else:
-    print("⚠️ WANDB_API_KEY not found - Weave tracking disabled")
+# Structured logging: JSON lines on stderr (or LOG_FILE), written by a background listener
+# so the request path never blocks on I/O. Set LOG_LEVEL=WARNING to run quiet.
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE")
+
+# Correlation id of the tool call being handled, attached to every log record
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+_STANDARD_LOG_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "request_id"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object, including the request id and any extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_LOG_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request id (runs in the caller's context, before queueing)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+def setup_logging() -> logging.Logger:
+    """Configure the server logger with a queue-backed, non-blocking JSON handler."""
+    logger = logging.getLogger("mcp-social-outreach")
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    # Worker processes import this module twice (as __mp_main__, then main); keep only the last handler
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    output = logging.FileHandler(LOG_FILE, encoding="utf-8") if LOG_FILE else logging.StreamHandler(sys.stderr)
+    output.setFormatter(logging.Formatter("%(message)s"))
+
+    log_queue = queue.SimpleQueue()
+    handler = QueueHandler(log_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(JsonFormatter())
+    logger.addHandler(handler)
+
+    listener = QueueListener(log_queue, output)
+    listener.start()
+    atexit.register(listener.stop)
+    return logger
+
+
+log = setup_logging()
+
+# Default latency buckets in seconds: cache hits land in the first few, actor runs in the last
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Name of the tool being handled, used to label metrics recorded deeper in the call
+tool_var = contextvars.ContextVar("tool", default="none")
+
+
+class MetricsRegistry:
+    """Minimal in-process Prometheus registry: labelled counters, gauges and histograms in text format."""
+
+    def __init__(self):
+        self._meta = {}
+        self._series = {}
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._meta[name] = ("counter", help_text, None)
+        self._series[name] = {}
+
+    def gauge(self, name: str, help_text: str) -> None:
+        self._meta[name] = ("gauge", help_text, None)
+        self._series[name] = {}
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS) -> None:
+        self._meta[name] = ("histogram", help_text, tuple(buckets))
+        self._series[name] = {}
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add amount to a counter or gauge (use a negative amount to decrease a gauge)."""
+        series = self._series[name]
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record one histogram observation."""
+        series = self._series[name]
+        key = tuple(sorted(labels.items()))
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [[0] * len(self._meta[name][2]), 0.0, 0]
+        for i, bound in enumerate(self._meta[name][2]):
+            if value <= bound:
+                state[0][i] += 1
+        state[1] += value
+        state[2] += 1
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """Observe the duration of the with-block, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for name, (kind, help_text, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, value in self._series[name].items():
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(key)} {value}")
+                    continue
+                counts, total, count = value
+                for bound, bucket_count in zip(buckets, counts):
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', str(bound)),))} {bucket_count}")
+                lines.append(f"{name}_bucket{format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{format_labels(key)} {total}")
+                lines.append(f"{name}_count{format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(key: tuple) -> str:
+    """Render sorted (name, value) label pairs as a Prometheus label set."""
+    if not key:
+        return ""
+    pairs = []
+    for name, value in key:
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.histogram("mcp_tool_duration_seconds", "Tool call latency")
+metrics.histogram("mcp_phase_duration_seconds",
+                  "Latency of one phase of a tool call (actor_queue, actor_start, actor_run, dataset_fetch, response_build)")
+metrics.gauge("mcp_tool_calls_in_flight", "Tool calls currently being handled")
+metrics.counter("mcp_tool_calls_total", "Tool calls handled, by outcome")
+metrics.counter("mcp_response_bytes_total", "Bytes of tool responses returned")
+metrics.counter("mcp_response_tokens_total", "Estimated LLM tokens of tool responses returned (see estimate_tokens)")
+metrics.counter("mcp_cache_requests_total", "Result cache lookups, by result (hit or miss)")
+metrics.gauge("apify_actor_runs_in_flight", "Actor runs started and not yet finished")
+metrics.gauge("apify_actor_runs_waiting", "Actor runs waiting for a concurrency slot")
+metrics.counter("apify_errors_total", "Apify API errors and unsuccessful actor runs, by type")
+metrics.counter("mcp_hedged_lookups_total", "Lookups that started a hedge run, by reason (slow or failed primary)")
+metrics.counter("mcp_hedge_wins_total", "Hedged lookups by which run returned first (primary or hedge)")
+metrics.counter("mcp_last_seen_reused_total", "Refreshes that found nothing newer and returned the last-seen post")
+metrics.counter("mcp_runs_rejected_total", "Actor runs refused with a server-busy error because the run queue was full")
+metrics.counter("apify_runs_aborted_total", "Actor runs aborted because their caller's deadline passed or it went away")
+metrics.counter("mcp_store_errors_total", "Bookkeeping writes skipped because their SQLite store stayed locked, by call")
+metrics.counter("mcp_coalesced_runs_total", "Actor runs saved by joining an identical in-flight run, by source (worker or peer)")
+
+
+def apify_error_type(error: Exception) -> str:
+    """Short label for an Apify failure: the API error type when there is one, else the exception class."""
+    return getattr(error, "type", None) or type(error).__name__
+
+# Weave tracking is imported and initialized in the background (heavy imports plus a
+# network round-trip), so it never delays startup; calls made before it's ready go untraced
+WANDB_API_KEY = os.getenv("WANDB_API_KEY")
+_weave_client = None
+_tracing_started = False
+_tracing_lock = threading.Lock()
+
+# Sampled tool calls become spans in a bounded buffer that a background thread exports to
+# Weave in batches; when the buffer is full (backend slow or down) spans are dropped, never waited on
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+TRACE_MAX_PAYLOAD_CHARS = int(os.getenv("TRACE_MAX_PAYLOAD_CHARS", "2000"))
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "1000"))
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", "50"))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "5"))
+
+# Initialize Apify client
+APIFY_API_TOKEN = os.getenv("APIFY_API_TOKEN")
+if not APIFY_API_TOKEN:
+    raise ValueError("APIFY_API_TOKEN environment variable is required")
+
+# Override to point at a local stand-in (see fake_apify.py)
+APIFY_API_URL = os.getenv("APIFY_API_URL") or None
+
+# Transient API failures (5xx, 429, network errors) are retried by the client with jittered
+# exponential backoff: a random 1-2x of APIFY_RETRY_BASE_MS, doubling per attempt
+APIFY_MAX_RETRIES = int(os.getenv("APIFY_MAX_RETRIES", "3"))
+APIFY_RETRY_BASE_MS = int(os.getenv("APIFY_RETRY_BASE_MS", "500"))
+APIFY_REQUEST_TIMEOUT_SECS = int(os.getenv("APIFY_REQUEST_TIMEOUT_SECS", "30"))
+
+# Created on first use by get_client()
+_client = None
+
+# Import + init time budget enforced by --check-startup (milliseconds)
+STARTUP_BUDGET_MS = int(os.getenv("STARTUP_BUDGET_MS", "2000"))
+
+
+def get_client() -> "ApifyClientAsync":
+    """Return the shared Apify client, importing and creating it on first use."""
+    global _client
+    if _client is None:
+        from apify_client import ApifyClientAsync
+        _client = ApifyClientAsync(
+            APIFY_API_TOKEN,
+            api_url=APIFY_API_URL,
+            max_retries=APIFY_MAX_RETRIES,
+            min_delay_between_retries_millis=APIFY_RETRY_BASE_MS,
+            timeout_secs=APIFY_REQUEST_TIMEOUT_SECS,
+        )
+    return _client
+
+
+def truncate_for_trace(value):
+    """Shorten a traced input/output to at most TRACE_MAX_PAYLOAD_CHARS characters."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False, default=str)
+    if len(text) <= TRACE_MAX_PAYLOAD_CHARS:
+        return value
+    return f"{text[:TRACE_MAX_PAYLOAD_CHARS]}...[+{len(text) - TRACE_MAX_PAYLOAD_CHARS} chars]"
+
+
+class SpanExporter:
+    """Bounded buffer of finished tool-call spans, exported to Weave in batches by a background thread."""
+
+    def __init__(self, buffer_size: int, batch_size: int, flush_interval: float):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.captured = 0
+        self.exported = 0
+        self.dropped = 0
+        self.capture_seconds = 0.0  # Time spent on the request path building and queueing spans
+        self._queue = queue.Queue(maxsize=buffer_size)
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def submit(self, span: dict) -> None:
+        """Queue a span without blocking; drops it if the buffer is full."""
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "captured": self.captured,
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "buffered": self._queue.qsize(),
+            "avg_overhead_us": round(self.capture_seconds / self.captured * 1e6, 1) if self.captured else 0.0,
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._export(batch)
+
+    def _export(self, batch: list) -> None:
+        if _weave_client is None:
+            # Tracing is still initializing (or failed to); these spans have nowhere to go
+            self.dropped += len(batch)
+            return
+        try:
+            for span in batch:
+                call = _weave_client.create_call(span["op"], span["inputs"], attributes=span["attributes"], use_stack=False)
+                _weave_client.finish_call(call, output=span["output"])
+                self.exported += 1
+        except Exception as e:
+            self.dropped += len(batch) - batch.index(span)
+            log.warning("Trace export failed", extra={"error": str(e)})
+        log.info("Trace batch exported", extra={"spans": len(batch), **self.stats()})
+
+
+span_exporter = SpanExporter(TRACE_BUFFER_SIZE, TRACE_BATCH_SIZE, TRACE_FLUSH_INTERVAL)
+
+
+def init_tracing() -> None:
+    """Import weave and initialize Weave tracking."""
+    global _weave_client
+    try:
+        import weave
+        _weave_client = weave.init('mcp-social-outreach')
+        log.info("Weave tracking initialized", extra={"sample_rate": TRACE_SAMPLE_RATE})
+    except Exception as e:
+        log.warning("Weave tracking failed to initialize", extra={"error": str(e)})
+
+
+def start_tracing() -> None:
+    """Initialize Weave tracking in a background thread (once), if WANDB_API_KEY is set."""
+    global _tracing_started
+    with _tracing_lock:
+        if _tracing_started:
+            return
+        _tracing_started = True
+    if WANDB_API_KEY:
+        threading.Thread(target=init_tracing, name="weave-init", daemon=True).start()
+        span_exporter.start()
+    else:
+        log.info("WANDB_API_KEY not found - Weave tracking disabled")
+
+
+def traced(func):
+    """Tag a tool's logs with a fresh request id and, for a sampled share of calls, record a span for Weave."""
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start_tracing()
+        request_id = uuid.uuid4().hex[:12]
+        token = request_id_var.set(request_id)
+        tool_token = tool_var.set(func.__name__)
+        metrics.inc("mcp_tool_calls_in_flight", tool=func.__name__)
+        sampled = bool(WANDB_API_KEY) and random.random() < TRACE_SAMPLE_RATE
+        started_at = time.time()
+        started = time.perf_counter()
+        output = error = None
+        try:
+            output = await func(*args, **kwargs)
+            return output
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            request_id_var.reset(token)
+            tool_var.reset(tool_token)
+            metrics.inc("mcp_tool_calls_in_flight", -1, tool=func.__name__)
+            metrics.observe("mcp_tool_duration_seconds", duration, tool=func.__name__)
+            failed = error is not None or (isinstance(output, str) and output.startswith('{"error"'))
+            metrics.inc("mcp_tool_calls_total", tool=func.__name__, outcome="error" if failed else "ok")
+            if isinstance(output, str):
+                metrics.inc("mcp_response_bytes_total", len(output.encode("utf-8")), tool=func.__name__)
+                metrics.inc("mcp_response_tokens_total", estimate_tokens(output), tool=func.__name__)
+            if sampled:
+                capture_started = time.perf_counter()
+                bound = signature.bind_partial(*args, **kwargs)
+                inputs = {
+                    name: truncate_for_trace(value)
+                    for name, value in bound.arguments.items()
+                    if not isinstance(value, Context)
+                }
+                span_exporter.submit({
+                    "op": func.__name__,
+                    "inputs": inputs,
+                    "output": truncate_for_trace(output if error is None else f"{type(error).__name__}: {error}"),
+                    "attributes": {
+                        "request_id": request_id,
+                        "started_at": datetime.fromtimestamp(started_at).isoformat(),
+                        "duration_ms": round(duration * 1000, 1),
+                    },
+                })
+                span_exporter.captured += 1
+                span_exporter.capture_seconds += time.perf_counter() - capture_started
+
+    return wrapper
+
+
+TWITTER_ACTOR_ID = "apidojo/tweet-scraper"
+LINKEDIN_ACTOR_ID = "apimaestro/linkedin-profile-posts"
+
+# Maximum number of handles packed into one tweet-scraper run by the batch tool
+TWITTER_BATCH_SIZE = int(os.getenv("TWITTER_BATCH_SIZE", "50"))
+
+# Maximum number of concurrent runs per actor (callers beyond this wait their turn)
+DEFAULT_ACTOR_CONCURRENCY = int(os.getenv("APIFY_ACTOR_CONCURRENCY", "10"))
+ACTOR_CONCURRENCY = {
+    TWITTER_ACTOR_ID: int(os.getenv("APIFY_TWITTER_CONCURRENCY", DEFAULT_ACTOR_CONCURRENCY)),
+    LINKEDIN_ACTOR_ID: int(os.getenv("APIFY_LINKEDIN_CONCURRENCY", DEFAULT_ACTOR_CONCURRENCY)),
+}
+
+# Account-wide run budget shared by all actors, and how many runs may wait for it before
+# new ones are turned away with a "server busy" error
+APIFY_MAX_CONCURRENT_RUNS = int(os.getenv("APIFY_MAX_CONCURRENT_RUNS", "25"))
+APIFY_MAX_QUEUED_RUNS = int(os.getenv("APIFY_MAX_QUEUED_RUNS", "100"))
+
+# Which platform each actor serves, and each platform's share of the run budget when both are queued
+ACTOR_PLATFORMS = {TWITTER_ACTOR_ID: "twitter", LINKEDIN_ACTOR_ID: "linkedin"}
+PLATFORM_WEIGHTS = {
+    "twitter": float(os.getenv("APIFY_TWITTER_WEIGHT", "1")),
+    "linkedin": float(os.getenv("APIFY_LINKEDIN_WEIGHT", "1")),
+}
+
+# Queued runs are admitted in this order: interactive tool calls before batch, batch before prefetch
+RUN_PRIORITIES = {"interactive": 0, "batch": 1, "prefetch": 2}
+run_priority_var = contextvars.ContextVar("run_priority", default="interactive")
+
+
+class ServerBusy(Exception):
+    """The actor run queue is full; the caller should retry later."""
+
+
+class RunScheduler:
+    """Admits actor runs against a global concurrent-run budget and per-actor caps.
+
+    Waiting runs are admitted by priority, then by platform (the platform using the smallest
+    share of its weight goes first), then first come first served. Once max_queued runs are
+    waiting, further requests fail fast with ServerBusy.
+    """
+
+    def __init__(self, budget: int, max_queued: int):
+        self.budget = budget
+        self.max_queued = max_queued
+        self.running = 0
+        self._running_by_actor = {}
+        self._running_by_platform = {}
+        self._waiters = []
+        self._seq = 0
+
+    async def acquire(self, actor_id: str, priority: str = "interactive") -> None:
+        """Wait for a run slot for actor_id; raises ServerBusy if the queue is full."""
+        await self.wait(actor_id, self.enqueue(actor_id, priority))
+
+    def enqueue(self, actor_id: str, priority: str = "interactive") -> asyncio.Future:
+        """Queue for a run slot for actor_id and return a future resolved once it is admitted.
+
+        Raises ServerBusy right away if the queue is full.
+        """
+        platform = ACTOR_PLATFORMS.get(actor_id, "other")
+        self._seq += 1
+        waiter = (RUN_PRIORITIES.get(priority, len(RUN_PRIORITIES)), self._seq, platform, actor_id,
+                  asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._dispatch()
+        if not waiter[4].done() and len(self._waiters) > self.max_queued:
+            self._waiters.remove(waiter)
+            metrics.inc("mcp_runs_rejected_total", platform=platform, priority=priority)
+            raise ServerBusy(f"Server busy: {self.max_queued} actor runs already queued, retry in a few seconds")
+        return waiter[4]
+
+    async def wait(self, actor_id: str, admission: asyncio.Future) -> None:
+        """Wait until a place queued with enqueue is admitted, leaving the queue if the caller gives up."""
+        try:
+            await admission
+        except asyncio.CancelledError:
+            self.withdraw(actor_id, admission)
+            raise
+
+    def withdraw(self, actor_id: str, admission: asyncio.Future) -> None:
+        """Give up a place queued with enqueue, or the slot it has already been admitted to."""
+        waiter = next((waiter for waiter in self._waiters if waiter[4] is admission), None)
+        if waiter is not None:
+            self._waiters.remove(waiter)
+        elif not admission.cancelled():
+            self.release(actor_id)  # Admitted just as the caller gave up
+
+    def release(self, actor_id: str) -> None:
+        """Free the slot held by a finished run of actor_id and admit the next waiting run."""
+        platform = ACTOR_PLATFORMS.get(actor_id, "other")
+        self.running -= 1
+        self._running_by_actor[actor_id] -= 1
+        self._running_by_platform[platform] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self.running < self.budget:
+            eligible = [
+                waiter for waiter in self._waiters
+                if not waiter[4].done()  # A cancelled waiter leaves the queue once its task runs again
+                and self._running_by_actor.get(waiter[3], 0) < ACTOR_CONCURRENCY.get(waiter[3], DEFAULT_ACTOR_CONCURRENCY)
+            ]
+            if not eligible:
+                return
+            waiter = min(eligible, key=lambda w: (
+                w[0], self._running_by_platform.get(w[2], 0) / PLATFORM_WEIGHTS.get(w[2], 1), w[1]
+            ))
+            self._waiters.remove(waiter)
+            self.running += 1
+            self._running_by_actor[waiter[3]] = self._running_by_actor.get(waiter[3], 0) + 1
+            self._running_by_platform[waiter[2]] = self._running_by_platform.get(waiter[2], 0) + 1
+            waiter[4].set_result(None)
+
+
+run_scheduler = RunScheduler(APIFY_MAX_CONCURRENT_RUNS, APIFY_MAX_QUEUED_RUNS)
+
+
+@contextmanager
+def run_priority(priority: str):
+    """Schedule actor runs started inside the with-block (and tasks created in it) at the given priority."""
+    token = run_priority_var.set(priority)
+    try:
+        yield
+    finally:
+        run_priority_var.reset(token)
+
+# Per-actor run options passed to Apify when starting a run (unset options use the actor's defaults)
+ACTOR_RUN_OPTIONS = {
+    TWITTER_ACTOR_ID: {
+        "timeout_secs": os.getenv("APIFY_TWITTER_TIMEOUT_SECS"),
+        "memory_mbytes": os.getenv("APIFY_TWITTER_MEMORY_MB"),
+        "build": os.getenv("APIFY_TWITTER_BUILD"),
+    },
+    LINKEDIN_ACTOR_ID: {
+        "timeout_secs": os.getenv("APIFY_LINKEDIN_TIMEOUT_SECS"),
+        "memory_mbytes": os.getenv("APIFY_LINKEDIN_MEMORY_MB"),
+        "build": os.getenv("APIFY_LINKEDIN_BUILD"),
+    },
+}
+
+# Default time budget for a scrape tool call (seconds); tools accept deadline_secs to override it
+TOOL_DEADLINE_SECS = float(os.getenv("TOOL_DEADLINE_SECS", "300"))
+
+# Monotonic time by which the current tool call must finish (None = no deadline)
+deadline_var = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """A tool call ran out of time; any actor run it was waiting on has been aborted."""
+
+
+class ActorRunFailed(Exception):
+    """An actor run finished without succeeding (FAILED, TIMED-OUT or ABORTED) or could not be found."""
+
+
+def time_remaining() -> Optional[float]:
+    """Seconds left before the current tool call's deadline, or None if it has none."""
+    deadline = deadline_var.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+async def within_deadline(deadline_secs: Optional[float], factory):
+    """Await factory() with a deadline that actor calls made inside it can see, giving up once it passes."""
+    deadline_secs = deadline_secs or TOOL_DEADLINE_SECS
+    token = deadline_var.set(time.monotonic() + deadline_secs)
+    try:
+        return await asyncio.wait_for(factory(), deadline_secs)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline of {deadline_secs:g}s exceeded") from None
+    finally:
+        deadline_var.reset(token)
+
+
+def actor_run_options(actor_id: str) -> dict:
+    """Configured run options for an actor, with the run timeout capped at the current deadline."""
+    options = {
+        name: (value if name == "build" else int(value))
+        for name, value in ACTOR_RUN_OPTIONS.get(actor_id, {}).items()
+        if value
+    }
+    remaining = time_remaining()
+    if remaining is not None:
+        # Let Apify stop the run itself too, in case we're not around to abort it
+        options["timeout_secs"] = min(options.get("timeout_secs", math.inf), max(1, math.ceil(remaining)))
+    return options
+
+
+async def abort_run(run_id: str) -> None:
+    """Abort an actor run we no longer need, logging (not raising) failures."""
+    try:
+        await get_client().run(run_id).abort()
+        metrics.inc("apify_runs_aborted_total")
+        log.warning("Aborted actor run", extra={"run_id": run_id})
+    except Exception as e:
+        log.error("Failed to abort actor run", extra={"run_id": run_id, "error": str(e)})
+
+
+async def wait_for_run(run_id: str) -> Optional[dict]:
+    """Wait for a run to finish or the current deadline to pass, whichever comes first.
+
+    Each long-poll is kept shorter than APIFY_REQUEST_TIMEOUT_SECS so the client's own request
+    timeout never cuts a long run short.
+    """
+    chunk_secs = max(1, APIFY_REQUEST_TIMEOUT_SECS // 2)
+    while True:
+        remaining = time_remaining()
+        wait_secs = chunk_secs if remaining is None else max(1, min(chunk_secs, math.ceil(remaining)))
+        run = await get_client().run(run_id).wait_for_finish(wait_secs=wait_secs)
+        if run is None or run.get("status") in JOB_TERMINAL_STATUSES:
+            return run
+        remaining = time_remaining()
+        if remaining is not None and remaining <= 0:
+            return run
+
+
+async def acquire_run_slot(actor_id: str, priority: str, admission: Optional[asyncio.Future] = None) -> Optional[str]:
+    """Wait for a run slot from this process's scheduler and, with several workers, the shared run budget.
+
+    admission is a place already queued with run_scheduler.enqueue, if any. Returns the shared budget
+    lease to release when the run ends (None with a single worker).
+    """
+    await run_scheduler.wait(actor_id, run_scheduler.enqueue(actor_id, priority) if admission is None else admission)
+    if leases is None:
+        return None
+    try:
+        while True:
+            slot = await asyncio.to_thread(
+                leases.acquire_slot, "run:", APIFY_MAX_CONCURRENT_RUNS, time_remaining() or TOOL_DEADLINE_SECS
+            )
+            if slot is not None:
+                return slot
+            await asyncio.sleep(LEASE_POLL_SECS)
+    except BaseException:
+        run_scheduler.release(actor_id)
+        raise
+
+
+async def release_run_slot(actor_id: str, slot: Optional[str]) -> None:
+    """Give back a run slot taken with acquire_run_slot."""
+    run_scheduler.release(actor_id)
+    if slot is not None:
+        await asyncio.to_thread(leases.release, slot)
+
+
+# Background tasks running start_scrape jobs; kept here so they aren't garbage collected
+detached_runs = set()
+
+
+def queue_job_run(job_id: str, actor_id: str, run_input: dict, admission: asyncio.Future) -> None:
+    """Start a queued job's actor run in the background once admission (from run_scheduler.enqueue) resolves."""
+    task = asyncio.ensure_future(run_detached(job_id, actor_id, run_input, admission))
+    detached_runs.add(task)
+    task.add_done_callback(detached_runs.discard)
+
+
+async def run_detached(job_id: str, actor_id: str, run_input: dict, admission: asyncio.Future) -> None:
+    """Start a job's actor run once it has a run slot, then hold the slot until the run finishes.
+
+    The run outlives the tool call that queued it, so this task has no deadline.
+    """
+    deadline_var.set(None)
+    try:
+        slot = await acquire_run_slot(actor_id, run_priority_var.get(), admission)
+        try:
+            run = await start_actor(actor_id, run_input)
+        except BaseException:
+            await release_run_slot(actor_id, slot)
+            raise
+    except Exception as e:
+        log.error("Queued job failed to start", extra={"job_id": job_id, "error": str(e)})
+        await in_store(job_store.update, job_id, "FAILED", error=f"Error: {str(e)}")
+        return
+    await in_store(job_store.attach_run, job_id, run.get("status", "READY"), run["id"], run["defaultDatasetId"])
+    log.info("Started actor run", extra={"job_id": job_id, "run_id": run["id"]})
+    await hold_run_slot(actor_id, run["id"], slot)
+
+
+async def hold_run_slot(actor_id: str, run_id: str, slot: Optional[str]) -> None:
+    """Keep a detached run's slot until the run finishes (or can no longer be watched).
+
+    The shared budget lease is renewed meanwhile, since a job's run can last far longer than its TTL.
+    """
+    renewal = asyncio.ensure_future(keep_lease(slot, TOOL_DEADLINE_SECS)) if slot is not None else None
+    try:
+        await wait_for_run(run_id)
+    except Exception as e:
+        log.warning("Stopped watching detached run", extra={"run_id": run_id, "error": str(e)})
+    finally:
+        if renewal is not None:
+            renewal.cancel()
+        await release_run_slot(actor_id, slot)
+
+
+async def keep_lease(name: str, ttl: float) -> None:
+    """Renew a lease we hold for another ttl seconds, a third of the way into each period, until cancelled."""
+    while True:
+        await asyncio.sleep(ttl / 3)
+        if not await asyncio.to_thread(leases.renew, name, ttl):
+            log.warning("Lost run budget lease", extra={"lease": name})
+            return
+
+
+async def call_actor(actor_id: str, run_input: dict) -> dict:
+    """Run an Apify actor and wait for it to finish without blocking the event loop.
+
+    Raises ActorRunFailed unless the run SUCCEEDED, so its dataset is only ever read from a good run.
+    """
+    tool = tool_var.get()
+    metrics.inc("apify_actor_runs_waiting", actor=actor_id)
+    try:
+        with metrics.time("mcp_phase_duration_seconds", tool=tool, phase="actor_queue"):
+            slot = await asyncio.wait_for(acquire_run_slot(actor_id, run_priority_var.get()), time_remaining())
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(f"Deadline exceeded waiting for a free {actor_id} slot") from None
+    finally:
+        metrics.inc("apify_actor_runs_waiting", -1, actor=actor_id)
+    try:
+        # Start and wait as separate calls (what actor.call() does) so each phase is timed on its own;
+        # not passing a logger also keeps actor logs out of ours
+        run = await start_actor(actor_id, run_input)
+        run_id = run["id"]
+        metrics.inc("apify_actor_runs_in_flight", actor=actor_id)
+        try:
+            with metrics.time("mcp_phase_duration_seconds", tool=tool, phase="actor_run"):
+                run = await wait_for_run(run_id)
+        except asyncio.CancelledError:
+            # The caller gave up: stop paying for a run nobody will read
+            asyncio.ensure_future(abort_run(run_id))
+            raise
+        except Exception as e:
+            # Nobody will read this run's results either
+            metrics.inc("apify_errors_total", actor=actor_id, type=apify_error_type(e))
+            await abort_run(run_id)
+            raise
+        finally:
+            metrics.inc("apify_actor_runs_in_flight", -1, actor=actor_id)
+    finally:
+        await release_run_slot(actor_id, slot)
+    if run is not None and run.get("status") not in JOB_TERMINAL_STATUSES:
+        await abort_run(run_id)
+        metrics.inc("apify_errors_total", actor=actor_id, type="deadline_exceeded")
+        raise DeadlineExceeded(f"Deadline exceeded while actor run {run_id} was {run.get('status')} (run aborted)")
+    status = run.get("status", "UNKNOWN") if run else "NOT-FOUND"
+    if status != "SUCCEEDED":
+        # Whatever such a run left in its dataset is not a trustworthy answer
+        metrics.inc("apify_errors_total", actor=actor_id, type=f"run_{status.lower()}")
+        raise ActorRunFailed(f"Actor run {run_id} finished with status {status}")
+    return run
+
+
+async def start_actor(actor_id: str, run_input: dict) -> dict:
+    """Start an Apify actor run with its configured run options and return immediately with the run object."""
+    try:
+        with metrics.time("mcp_phase_duration_seconds", tool=tool_var.get(), phase="actor_start"):
+            return await get_client().actor(actor_id).start(run_input=run_input, **actor_run_options(actor_id))
+    except Exception as e:
+        metrics.inc("apify_errors_total", actor=actor_id, type=apify_error_type(e))
+        raise
+
+
+# Only these fields are downloaded from the actor datasets
+TWITTER_DATASET_FIELDS = ["text", "url", "createdAt", "likeCount", "retweetCount", "isRetweet", "author"]
+LINKEDIN_DATASET_FIELDS = ["text", "url", "post_type", "posted_at", "author", "stats"]
+
+# Dataset items are read lazily: a small first page (usually all we need), then larger pages
+DATASET_PAGE_SIZE = int(os.getenv("DATASET_PAGE_SIZE", "50"))
+
+
+async def stream_dataset_items(dataset_id: str, fields: List[str], first_page_size: int):
+    """Yield dataset items page by page so callers can stop reading as soon as they have what they need."""
+    dataset = get_client().dataset(dataset_id)
+    offset = 0
+    limit = first_page_size
+    while True:
+        try:
+            with metrics.time("mcp_phase_duration_seconds", tool=tool_var.get(), phase="dataset_fetch"):
+                page = await dataset.list_items(offset=offset, limit=limit, fields=fields)
+        except Exception as e:
+            metrics.inc("apify_errors_total", actor="dataset", type=apify_error_type(e))
+            raise
+        for item in page.items:
+            yield item
+        offset += page.count
+        if page.count < limit or offset >= page.total:
+            return
+        limit = DATASET_PAGE_SIZE
+
+# Result cache settings (TTLs in seconds; empty CACHE_DB_PATH keeps the cache in memory only)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "outreach_cache.db")
+CACHE_TTL = {
+    "twitter": int(os.getenv("CACHE_TTL_TWITTER", "3600")),
+    "linkedin": int(os.getenv("CACHE_TTL_LINKEDIN", "21600")),
+}
+
+
+# How long a store waits for another worker's write lock before giving up (seconds)
+SQLITE_BUSY_TIMEOUT_SECS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECS", "5"))
+
+
+def open_db(db_path: Optional[str], timeout: float = SQLITE_BUSY_TIMEOUT_SECS) -> sqlite3.Connection:
+    """Open a store's SQLite database; files use WAL so several worker processes can share them.
+
+    Connections autocommit: every write is a single statement, so one that fails on a lock leaves no
+    transaction open behind it.
+    """
+    db = sqlite3.connect(db_path or ":memory:", check_same_thread=False, timeout=timeout, isolation_level=None)
+    if db_path:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+# Stores are only used from this thread while serving requests: waiting on another worker's lock never
+# stalls the event loop, and calls run in the order they were made, so a read sees every earlier write
+store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+
+
+async def in_store(call, *args, **kwargs):
+    """Run a store method on the store thread and return its result."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        store_executor, functools.partial(context.run, call, *args, **kwargs)
+    )
+
+
+async def in_store_best_effort(call, *args, **kwargs) -> None:
+    """Run a bookkeeping write on the store thread, logging instead of failing the request if it can't be saved."""
+    try:
+        await in_store(call, *args, **kwargs)
+    except sqlite3.Error as e:
+        metrics.inc("mcp_store_errors_total", call=call.__qualname__)
+        log.warning("Store write skipped", extra={"call": call.__qualname__, "error": str(e)})
+
+
+class ResultCache:
+    """Two-tier result cache: an in-process LRU with TTL backed by a SQLite store that survives restarts."""
+
+    def __init__(self, max_entries: int, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._db = None
+        if db_path:
+            self._db = open_db(db_path)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM results WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return the cached value for key, or None if it is missing or expired."""
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                metrics.inc("mcp_cache_requests_total", result="hit")
+                return value
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute("SELECT value, expires_at FROM results WHERE key = ?", (key,)).fetchone()
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                self.hits += 1
+                metrics.inc("mcp_cache_requests_total", result="hit")
+                return value
+
+        self.misses += 1
+        metrics.inc("mcp_cache_requests_total", result="miss")
+        return None
+
+    def set(self, key: str, value: dict, ttl: int) -> None:
+        """Store value in both tiers for ttl seconds (the memory tier even if the database write fails)."""
+        expires_at = time.time() + ttl
+        self._remember(key, value, expires_at)
+        if self._db is not None:
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at),
+            )
+            self._db.commit()
+
+    def _remember(self, key: str, value: dict, expires_at: float) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+result_cache = ResultCache(CACHE_MAX_ENTRIES, CACHE_DB_PATH)
+
+
+# HTTP worker processes (see create_worker_app). With more than one, workers coordinate through
+# leases in a shared SQLite file so they neither duplicate actor runs nor exceed the run budget
+MCP_WORKERS = int(os.getenv("MCP_WORKERS", "1"))
+LEASE_DB_PATH = os.getenv("LEASE_DB_PATH", CACHE_DB_PATH)
+# How often a worker waiting on another worker's lease checks it again (seconds)
+LEASE_POLL_SECS = float(os.getenv("LEASE_POLL_SECS", "0.25"))
+# How long a finished run's result stays readable by workers that were waiting on it (seconds)
+LEASE_RESULT_SECS = 10
+
+
+class LeaseStore:
+    """SQLite leases shared by worker processes: a name is held by one owner until released or expired.
+
+    Leases are polled while waiting rather than queued behind other store calls, so this store has its own lock
+    and callers on the event loop run its methods with asyncio.to_thread.
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._lock = threading.Lock()
+        self._db = open_db(db_path, timeout=10)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases ("
+            "name TEXT PRIMARY KEY, owner TEXT, expires_at REAL NOT NULL, result TEXT)"
+        )
+        self._db.execute("DELETE FROM leases WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+
+    def acquire(self, name: str, ttl: float) -> bool:
+        """Take the lease on name for ttl seconds; False if someone else holds it (or its result)."""
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO leases (name, owner, expires_at, result) VALUES (?, ?, ?, NULL) "
+                "ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at, "
+                "result = NULL WHERE leases.expires_at <= ?",
+                (name, self.owner, now + ttl, now),
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def held(self, name: str) -> bool:
+        """Whether the lease on name (or its result) is live, read without taking the write lock."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT 1 FROM leases WHERE name = ? AND expires_at > ?", (name, time.time())
+            ).fetchone()
+        return row is not None
+
+    def acquire_slot(self, prefix: str, limit: int, ttl: float) -> Optional[str]:
+        """Take one of limit leases sharing prefix and return its name, or None if all are held."""
+        now = time.time()
+        name = f"{prefix}{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._db.execute("DELETE FROM leases WHERE expires_at <= ?", (now,))
+            cursor = self._db.execute(
+                "INSERT INTO leases (name, owner, expires_at) SELECT ?, ?, ? "
+                "WHERE (SELECT COUNT(*) FROM leases WHERE name LIKE ? AND expires_at > ?) < ?",
+                (name, self.owner, now + ttl, f"{prefix}%", now, limit),
+            )
+            self._db.commit()
+        return name if cursor.rowcount == 1 else None
+
+    def release(self, name: str, result: Optional[str] = None, keep_secs: float = 0) -> None:
+        """Give up a lease we hold; with keep_secs, leave result readable by other workers for that long."""
+        with self._lock:
+            if keep_secs:
+                self._db.execute(
+                    "UPDATE leases SET owner = NULL, result = ?, expires_at = ? WHERE name = ? AND owner = ?",
+                    (result, time.time() + keep_secs, name, self.owner),
+                )
+            else:
+                self._db.execute("DELETE FROM leases WHERE name = ? AND owner = ?", (name, self.owner))
+            self._db.commit()
+
+    def renew(self, name: str, ttl: float) -> bool:
+        """Push back the expiry of a lease we hold to ttl seconds from now; False if we no longer hold it."""
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE leases SET expires_at = ? WHERE name = ? AND owner = ?", (time.time() + ttl, name, self.owner)
+            )
+            self._db.commit()
+        return cursor.rowcount == 1
+
+    def finished_result(self, name: str) -> Optional[str]:
+        """The result left by a released lease on name, or None if it's still held or gone."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM leases WHERE name = ? AND owner IS NULL AND expires_at > ?", (name, time.time())
+            ).fetchone()
+        return row[0] if row else None
+
+
+leases = LeaseStore(LEASE_DB_PATH) if MCP_WORKERS > 1 else None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key onto one in-flight coroutine, across workers given leases."""
+
+    def __init__(self, leases: Optional[LeaseStore] = None):
+        self.saved = 0
+        self.leases = leases
+        self._inflight = {}
+        self._waiters = Counter()
+
+    async def run(self, key: str, factory):
+        """Await factory() for key, joining an identical call that is already in flight.
+
+        The shared call runs without a deadline: each caller's own deadline (within_deadline) only
+        stops that caller waiting, and the shared call is cancelled once every caller has gone.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._shared(key, factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.saved += 1
+            metrics.inc("mcp_coalesced_runs_total", source="worker")
+            log.info("Joined in-flight actor run", extra={"saved_runs": self.saved})
+        self._waiters[task] += 1
+        try:
+            # Shield the shared run so one caller leaving doesn't cancel it for the others
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    task.cancel()  # Nobody is left to read it; this aborts the actor run
+
+    async def _shared(self, key: str, factory):
+        deadline_var.set(None)  # The task has its own copy of the context, so callers keep their deadlines
+        return await (factory() if self.leases is None else self._lead(key, factory))
+
+    async def _lead(self, key: str, factory):
+        """Await factory() unless another worker is already running it, in which case wait for its result.
+
+        While the lease is held elsewhere it is only read; the write to take it is tried once it looks free.
+        """
+        while True:
+            result = await asyncio.to_thread(self.leases.finished_result, key)
+            if result is not None:
+                self.saved += 1
+                metrics.inc("mcp_coalesced_runs_total", source="peer")
+                log.info("Joined another worker's actor run", extra={"saved_runs": self.saved})
+                return json.loads(result)
+            if (not await asyncio.to_thread(self.leases.held, key)
+                    and await asyncio.to_thread(self.leases.acquire, key, time_remaining() or TOOL_DEADLINE_SECS)):
+                try:
+                    value = await factory()
+                except BaseException:
+                    await asyncio.to_thread(self.leases.release, key)
+                    raise
+                await asyncio.to_thread(
+                    self.leases.release, key, json.dumps(value, ensure_ascii=False), keep_secs=LEASE_RESULT_SECS
+                )
+                return value
+            await asyncio.sleep(LEASE_POLL_SECS)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # Mark as retrieved even if every waiter went away
+
+
+inflight_scrapes = SingleFlight(leases)
+
+
+# Job table for non-blocking scrapes (defaults to the cache database; empty keeps jobs in memory)
+JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", CACHE_DB_PATH)
+JOB_TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED"}
+# How often get_scrape_result re-checks a running job while waiting (seconds)
+JOB_POLL_INTERVAL = int(os.getenv("JOB_POLL_INTERVAL", "5"))
+
+
+class JobStore:
+    """SQLite table tracking actor runs started in job mode."""
+
+    COLUMNS = ("job_id", "platform", "run_input", "run_id", "dataset_id", "status", "result", "error", "created_at", "updated_at")
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db = open_db(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, platform TEXT NOT NULL, run_input TEXT NOT NULL, run_id TEXT, dataset_id TEXT, "
+            "status TEXT NOT NULL, result TEXT, error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def create(self, platform: str, run_input: dict, status: str, run_id: Optional[str] = None,
+               dataset_id: Optional[str] = None, result: Optional[dict] = None) -> str:
+        """Record a new job and return its id."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        self._db.execute(
+            "INSERT INTO jobs (job_id, platform, run_input, run_id, dataset_id, status, result, error, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, NULL, ?, ?)",
+            (job_id, platform, json.dumps(run_input), run_id, dataset_id, status,
+             json.dumps(result, ensure_ascii=False) if result is not None else None, now, now),
+        )
+        self._db.commit()
+        return job_id
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return the job as a dict, or None if it doesn't exist."""
+        row = self._db.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job["run_input"] = json.loads(job["run_input"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def attach_run(self, job_id: str, status: str, run_id: str, dataset_id: str) -> None:
+        """Record the actor run started for a queued job."""
+        self._db.execute(
+            "UPDATE jobs SET status = ?, run_id = ?, dataset_id = ?, updated_at = ? WHERE job_id = ?",
+            (status, run_id, dataset_id, time.time(), job_id),
+        )
+        self._db.commit()
+
+    def update(self, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None) -> None:
+        """Update the status (and final result or error) of a job."""
+        self._db.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+            (status, json.dumps(result, ensure_ascii=False) if result is not None else None, error, time.time(), job_id),
+        )
+        self._db.commit()
+
+
+job_store = JobStore(JOBS_DB_PATH)
+
+# Newest post seen per profile, used to ask actors only for newer content (defaults to the cache database)
+LAST_SEEN_DB_PATH = os.getenv("LAST_SEEN_DB_PATH", CACHE_DB_PATH)
+
+
+class LastSeenStore:
+    """SQLite table of the newest post seen per (platform, profile), kept across cache expiry and restarts."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db = open_db(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS last_seen ("
+            "platform TEXT NOT NULL, identifier TEXT NOT NULL, post_id TEXT NOT NULL, posted_at TEXT, "
+            "post TEXT NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (platform, identifier))"
+        )
+        self._db.commit()
+
+    def get(self, platform: str, identifier: str) -> Optional[dict]:
+        """Return {"post_id", "posted_at", "post"} for the profile, or None if nothing was seen yet."""
+        row = self._db.execute(
+            "SELECT post_id, posted_at, post FROM last_seen WHERE platform = ? AND identifier = ?",
+            (platform, identifier),
+        ).fetchone()
+        if row is None:
+            return None
+        return {"post_id": row[0], "posted_at": row[1], "post": json.loads(row[2])}
+
+    def record(self, platform: str, identifier: str, post_id: str, posted_at: Optional[str], post: dict) -> None:
+        """Store post as the newest seen for the profile."""
+        self._db.execute(
+            "INSERT OR REPLACE INTO last_seen (platform, identifier, post_id, posted_at, post, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (platform, identifier, post_id, posted_at, json.dumps(post, ensure_ascii=False), time.time()),
+        )
+        self._db.commit()
+
+
+last_seen = LastSeenStore(LAST_SEEN_DB_PATH)
+
+# Names/URLs mapped to verified handles, plus identifiers that recently returned nothing (defaults to the cache database)
+HANDLE_INDEX_DB_PATH = os.getenv("HANDLE_INDEX_DB_PATH", CACHE_DB_PATH)
+# How long an identifier that returned no posts is answered from the index without a new actor run (seconds)
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "21600"))
+
+
+def alias_key(raw: str) -> str:
+    """Canonical form of a user-supplied name, handle or profile URL, used as the index key."""
+    key = " ".join(raw.lower().split()).lstrip("@").rstrip("/")
+    for prefix in ("https://", "http://", "www."):
+        key = key.removeprefix(prefix)
+    return key
+
+
+class HandleIndex:
+    """SQLite index resolving names and URLs to verified handles, with a TTL'd list of known misses."""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db = open_db(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS handle_aliases ("
+            "platform TEXT NOT NULL, alias TEXT NOT NULL, handle TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (platform, alias))"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS handle_misses ("
+            "platform TEXT NOT NULL, identifier TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (platform, identifier))"
+        )
+        self._db.execute("DELETE FROM handle_misses WHERE expires_at <= ?", (time.time(),))
+        self._db.commit()
+
+    def resolve(self, platform: str, raw: str) -> Optional[str]:
+        """Return the verified handle previously learned for raw, or None."""
+        row = self._db.execute(
+            "SELECT handle FROM handle_aliases WHERE platform = ? AND alias = ?", (platform, alias_key(raw))
+        ).fetchone()
+        return row[0] if row else None
+
+    def learn(self, platform: str, aliases: List[str], handle: str) -> None:
+        """Map each alias to handle, which just returned posts, and clear any miss recorded for it."""
+        now = time.time()
+        self._db.executemany(
+            "INSERT OR REPLACE INTO handle_aliases (platform, alias, handle, updated_at) VALUES (?, ?, ?, ?)",
+            [(platform, alias_key(alias), handle, now) for alias in aliases if alias and alias_key(alias) != handle],
+        )
+        self._db.execute("DELETE FROM handle_misses WHERE platform = ? AND identifier = ?", (platform, handle))
+        self._db.commit()
+
+    def is_known_miss(self, platform: str, identifier: str) -> bool:
+        """True if identifier returned no posts within the last NEGATIVE_CACHE_TTL seconds."""
+        row = self._db.execute(
+            "SELECT expires_at FROM handle_misses WHERE platform = ? AND identifier = ?", (platform, identifier)
+        ).fetchone()
+        return row is not None and row[0] > time.time()
+
+    def record_miss(self, platform: str, identifier: str, ttl: int = NEGATIVE_CACHE_TTL) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO handle_misses (platform, identifier, expires_at) VALUES (?, ?, ?)",
+            (platform, identifier, time.time() + ttl),
+        )
+        self._db.commit()
+
+
+handle_index = HandleIndex(HANDLE_INDEX_DB_PATH)
+
+# People to pre-scrape before an event (defaults to the cache database)
+WATCHLIST_DB_PATH = os.getenv("WATCHLIST_DB_PATH", CACHE_DB_PATH)
+# Entries are refreshed once this share of the platform's cache TTL has passed, so they never go cold
+WATCHLIST_REFRESH_FRACTION = 0.8
+
+
+class WatchlistStore:
+    """SQLite table of profiles kept warm in the result cache until their entry expires."""
+
+    COLUMNS = ("platform", "identifier", "expires_at", "last_prefetched_at", "last_status")
+
+    def __init__(self, db_path: Optional[str] = None):
+        self._db = open_db(db_path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS watchlist ("
+            "platform TEXT NOT NULL, identifier TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "last_prefetched_at REAL, last_status TEXT, PRIMARY KEY (platform, identifier))"
+        )
+        self._db.commit()
+
+    def add(self, platform: str, identifiers: List[str], hours: float) -> int:
+        """Watch identifiers for the next hours (extending entries already watched); returns how many were added."""
+        expires_at = time.time() + hours * 3600
+        identifiers = list(dict.fromkeys(i.strip() for i in identifiers if i and i.strip()))
+        self._db.executemany(
+            "INSERT INTO watchlist (platform, identifier, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (platform, identifier) DO UPDATE SET expires_at = MAX(expires_at, excluded.expires_at)",
+            [(platform, identifier, expires_at) for identifier in identifiers],
+        )
+        self._db.commit()
+        return len(identifiers)
+
+    def due(self) -> List[tuple]:
+        """Drop expired entries and return (platform, identifier) pairs whose cached result needs refreshing."""
+        now = time.time()
+        self._db.execute("DELETE FROM watchlist WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        rows = self._db.execute(
+            "SELECT platform, identifier, last_prefetched_at, last_status FROM watchlist "
+            "ORDER BY last_prefetched_at IS NOT NULL, last_prefetched_at"
+        ).fetchall()
+        # Failed prefetches are retried on the next pass, misses once the negative cache expires
+        refresh_after = {"error": 0, "miss": NEGATIVE_CACHE_TTL}
+        return [
+            (platform, identifier) for platform, identifier, prefetched_at, status in rows
+            if prefetched_at is None
+            or now - prefetched_at >= refresh_after.get(status, CACHE_TTL[platform] * WATCHLIST_REFRESH_FRACTION)
+        ]
+
+    def mark(self, platform: str, identifier: str, status: str) -> None:
+        """Record the outcome ("ok", "miss" or "error") of prefetching an entry."""
+        self._db.execute(
+            "UPDATE watchlist SET last_prefetched_at = ?, last_status = ? WHERE platform = ? AND identifier = ?",
+            (time.time(), status, platform, identifier),
+        )
+        self._db.commit()
+
+    def entries(self) -> List[dict]:
+        """All watched entries, soonest to expire first."""
+        rows = self._db.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM watchlist WHERE expires_at > ? ORDER BY expires_at", (time.time(),)
+        ).fetchall()
+        return [dict(zip(self.COLUMNS, row)) for row in rows]
+
+
+watchlist = WatchlistStore(WATCHLIST_DB_PATH)
+
+
+def make_cache_key(platform: str, run_input: dict) -> str:
+    """Build a stable cache key from the platform and the (normalized) actor input."""
+    payload = json.dumps([platform, run_input], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+TWITTER_PROFILE_URL = re.compile(r"^(?:https?://)?(?:www\.|mobile\.)?(?:x|twitter)\.com/@?(\w+)", re.IGNORECASE)
+
+
+def normalize_twitter_handle(handle: str) -> str:
+    """Normalize a Twitter handle; profile/tweet URLs are reduced to the handle and "First Last" becomes "firstlast"."""
+    handle = handle.strip()
+    match = TWITTER_PROFILE_URL.match(handle)
+    if match:
+        return match.group(1).lower()
+    if " " in handle and not handle.startswith("http"):
+        return handle.replace(" ", "").lower()
+    return handle.lstrip("@").lower()
+
+
+def normalize_linkedin_username(username: str) -> str:
+    """Normalize a LinkedIn username; profile URLs are reduced to the slug and full names become "first-last"."""
+    if 'linkedin.com/in/' in username:
+        username = username.split('linkedin.com/in/')[-1].strip('/')
+    username = username.strip()
+    if " " in username and not username.startswith("http"):
+        username = username.replace(" ", "-")
+    return username.lower()
+
+
+async def resolve_identifier(platform: str, raw: str) -> str:
+    """Return the verified handle learned for raw (a handle, full name or URL), else the normalized guess."""
+    normalize = normalize_twitter_handle if platform == "twitter" else normalize_linkedin_username
+    resolved = await in_store(handle_index.resolve, platform, raw)
+    if resolved is not None:
+        log.debug("Resolved identifier from index", extra={"platform": platform, "raw": raw, "handle": resolved})
+        return resolved
+    return normalize(raw)
+
+
+# Static instructions returned alongside the scraped content
+TWITTER_GUIDANCE = {
+    "agent_instruction": "Based on the tweet above, generate a witty, clever conversation starter with playful observations. Be cool and fun with smart wordplay or unexpected angles on their story.",
+    "context": "You're at the same event as this person and want to approach them naturally. Create an opening line that references their work without being awkward or overly flattering. Make it conversational and genuine.",
+    "requirements": [
+        "Be witty and playful with clever observations or wordplay",
+        "Use unexpected angles or fun metaphors (like the breakfast/eggs example)",
+        "Be casual and cool - show intelligence through humor",
+        "Keep it short and punchy (1-2 sentences max)",
+        "Make playful observations about their situation or story",
+        "NEVER use 'I saw', 'I heard', 'I read', 'I know' - just make observations",
+        "Think 'witty friend making clever comments at a party'"
+    ]
+}
+
+LINKEDIN_GUIDANCE = {
+    "agent_instruction": "Based on the LinkedIn post above, generate a witty, playful conversation starter with clever observations about their achievement. Be fun and cool with smart wordplay.",
+    "context": "You're at the same event as this person and want to start a conversation referencing their recent achievement. Make it sound natural and conversational, like you just recognized them.",
+    "requirements": [
+        "Be witty and playful with clever observations or wordplay",
+        "Use unexpected angles or fun metaphors about their achievement",
+        "Be casual and cool - show intelligence through humor",
+        "Keep it short and punchy (1-2 sentences max)",
+        "Make playful observations about their situation or work",
+        "NEVER use 'I' followed by any verb - just make witty observations",
+        "Think 'witty friend making clever comments about their success'"
+    ]
+}
+
+PERSON_GUIDANCE = {
+    "agent_instruction": "Based on the person's latest tweet and/or LinkedIn post above, generate one witty, playful conversation starter. Pick whichever post gives the better hook, or connect the two if they tell a story together.",
+    "context": "You're at the same event as this person and want to approach them naturally. Reference their recent content without being awkward or overly flattering.",
+    "requirements": [
+        "Be witty and playful with clever observations or wordplay",
+        "Be casual and cool - show intelligence through humor",
+        "Keep it short and punchy (1-2 sentences max)",
+        "Only use the platforms that returned a post; ignore ones marked with an error",
+        "NEVER use 'I saw', 'I heard', 'I read', 'I know' - just make observations"
+    ]
+}
+
+
+# Response defaults (tools can override per call): compact drops indentation, and
+# instructions="ref" / "none" replaces / omits the static guidance blocks
+COMPACT_RESPONSES = os.getenv("COMPACT_RESPONSES", "").lower() in ("1", "true", "yes")
+DEFAULT_INSTRUCTIONS = os.getenv("RESPONSE_INSTRUCTIONS", "full")
+# Default size budget for a response in characters (0 = unlimited); tools accept max_chars to override it
+RESPONSE_MAX_CHARS = int(os.getenv("RESPONSE_MAX_CHARS", "0"))
+
+
+def encode_json(obj, compact: bool = False) -> str:
+    """Serialize a response: indented by default, or minified (with orjson when installed)."""
+    if not compact:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+    if orjson is not None:
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count without a tokenizer: ~4 characters per token for ASCII, one per other character."""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(ascii_chars / 4) + len(text) - ascii_chars
+
+
+def json_len(text: str) -> int:
+    """Length of text once encoded as a JSON string, without the quotes."""
+    return len(json.dumps(text, ensure_ascii=False)) - 2
+
+
+def prune_empty(value: dict) -> dict:
+    """Copy of value without zero, empty or missing fields (nested dicts included)."""
+    pruned = {}
+    for key, item in value.items():
+        if isinstance(item, dict):
+            item = prune_empty(item)
+        if item not in (0, "", None, {}, []) or isinstance(item, bool):
+            pruned[key] = item
+    return pruned
+
+
+# English function words plus the filler common in social posts, left out of salience and topic counts
+STOPWORDS = frozenset("""
+a about above after again against ago all almost already also although always am among an and another
+any anyone anything are aren't around as at away back be became because become been before being below
+between both but by came can can't cannot come comes could couldn't did didn't do does doesn't doing don't
+done down during each either else enough especially even ever every everyone everything few first for
+from further get gets getting give go goes going gone got great had hadn't has hasn't have haven't having
+he he's her here hers herself him himself his how however i i'd i'll i'm i've if in instead into is isn't
+it it's its itself just keep know last lately least less let let's like likely little lot lots made make
+makes making many may maybe me might more most much must my myself need needs never new next no none nor
+not nothing now of off often oh ok okay on once one only or other others otherwise our ours ourselves out
+over own per perhaps quite rather really right said same say says see seem seems several shall she she's
+should shouldn't since so some someone something sometimes soon still such sure take takes than thank thanks
+that that's the their theirs them themselves then there there's these they they're thing things think this
+those though through thus to today together too took toward towards truly under until up upon us use used
+using very via want wants was wasn't way we we'd we'll we're we've week well went were weren't what what's
+when where whether which while who who's whole whom whose why will with within without won't would wouldn't
+yes yet you you'd you'll you're you've your yours yourself yourselves
+""".split())
+
+
+def sentence_scores(sentences: List[str]) -> List[float]:
+    """Salience of each sentence: how many other sentences share its content words, plus bonuses for
+    the opening line and for figures; lines that are mostly hashtags score low."""
+    words = [[w for w in re.findall(r"[a-z0-9']+", s.lower()) if len(w) > 2 and w not in STOPWORDS] for s in sentences]
+    # Count each word once per distinct sentence, so repeated boilerplate doesn't look important
+    distinct = {s.lower(): set(sentence_words) for s, sentence_words in zip(sentences, words)}
+    frequency = Counter(w for sentence_words in distinct.values() for w in sentence_words)
+    scores = []
+    for index, (sentence, sentence_words) in enumerate(zip(sentences, words)):
+        score = sum(frequency[w] for w in sentence_words) / math.sqrt(len(sentence_words)) if sentence_words else 0.0
+        score += (1.0 if index == 0 else 0.0) + (0.5 if re.search(r"\d", sentence) else 0.0)
+        tokens = sentence.split()
+        if tokens and sum(t.startswith("#") for t in tokens) * 2 > len(tokens):
+            score *= 0.2
+        scores.append(score)
+    return scores
+
+
+def truncate_words(text: str, limit: int) -> str:
+    """Cut text at a word boundary to at most limit JSON characters, marking the cut with an ellipsis."""
+    text = text[:limit]
+    while text and json_len(text) + 1 > limit:
+        cut = text.rfind(" ")
+        text = text[:cut] if cut > 0 else text[:-1]
+    return text.rstrip() + "…" if text else ""
+
+
+def condense_text(text: str, limit: int) -> str:
+    """Shorten text to at most limit JSON characters, keeping its most salient sentences in their original order."""
+    if json_len(text) <= limit:
+        return text
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+|\n+", text) if s.strip()]
+    scores = sentence_scores(sentences)
+    budget = limit - 2  # Room for a trailing " …"
+    chosen = set()
+    seen = set()
+    for index in sorted(range(len(sentences)), key=lambda i: -scores[i]):
+        cost = json_len(sentences[index]) + 3  # Plus the " … " (or " ") joining it to the previous one
+        if cost <= budget and sentences[index].lower() not in seen:
+            chosen.add(index)
+            seen.add(sentences[index].lower())
+            budget -= cost
+    if not chosen:
+        return truncate_words(sentences[max(range(len(sentences)), key=scores.__getitem__)] if sentences else text, limit)
+
+    parts = []
+    previous = -1
+    for index in sorted(chosen):
+        if parts or index > 0:
+            parts.append(" … " if index > previous + 1 else " ")
+        parts.append(sentences[index])
+        previous = index
+    if previous < len(sentences) - 1:
+        parts.append(" …")
+    return "".join(parts).strip()
+
+
+def share_budget(sizes: List[int], budget: int) -> List[int]:
+    """Split budget across items so that small ones keep their full size and large ones share the rest equally."""
+    shares = [0] * len(sizes)
+    remaining = max(0, budget)
+    for position, index in enumerate(sorted(range(len(sizes)), key=sizes.__getitem__)):
+        shares[index] = min(sizes[index], remaining // (len(sizes) - position))
+        remaining -= shares[index]
+    return shares
+
+
+# Keys that mark a dict in a response payload as a post
+POST_KEYS = ("text", "url")
+
+
+def map_posts(value, shape):
+    """Copy of a response payload with every post (a dict with "text" and "url") passed through shape."""
+    if isinstance(value, dict):
+        if all(key in value for key in POST_KEYS):
+            return shape(value)
+        return {key: map_posts(item, shape) for key, item in value.items()}
+    if isinstance(value, list):
+        return [map_posts(item, shape) for item in value]
+    return value
+
+
+class ResponseBuilder:
+    """Builds tool responses around a platform's static guidance, which is serialized once up front."""
+
+    def __init__(self, guidance: dict, uri: str):
+        self.uri = uri
+        self.guidance_json = encode_json(guidance)
+        # Guidance fields without the opening brace, ready to be spliced after the payload fields
+        self._tails = {
+            False: self.guidance_json[1:],
+            True: encode_json(guidance, compact=True)[1:],
+        }
+
+    def build(self, payload: dict, compact: bool = False, instructions: str = "full", max_chars: int = 0) -> str:
+        """Serialize payload followed by the full guidance, a reference to it, or nothing.
+
+        With max_chars, posts lose their empty fields and their text is condensed to fit the response
+        in that many characters (falling back to instructions="ref" if the guidance alone won't fit).
+        """
+        with metrics.time("mcp_phase_duration_seconds", tool=tool_var.get(), phase="response_build"):
+            if max_chars:
+                return self._build_within(payload, compact, instructions, max_chars)
+            return self._build(payload, compact, instructions)
+
+    def _build_within(self, payload: dict, compact: bool, instructions: str, max_chars: int) -> str:
+        texts = []
+
+        def strip_text(post: dict) -> dict:
+            texts.append(post.get("text") or "")
+            # text and url are how map_posts recognizes a post, so they survive pruning even when empty
+            pruned = prune_empty({key: value for key, value in post.items() if key not in POST_KEYS})
+            return {"text": "", "url": post["url"], **pruned}
+
+        skeleton = map_posts(payload, strip_text)
+        if instructions == "full" and len(self._build(skeleton, compact, instructions)) > max_chars:
+            instructions = "ref"
+        budget = max_chars - len(self._build(skeleton, compact, instructions))
+        condensed = iter([
+            condense_text(text, share)
+            for text, share in zip(texts, share_budget([json_len(text) for text in texts], budget))
+        ])
+        return self._build(map_posts(skeleton, lambda post: {**post, "text": next(condensed)}), compact, instructions)
+
+    def _build(self, payload: dict, compact: bool, instructions: str) -> str:
+        if instructions == "none":
+            return encode_json(payload, compact)
+        if instructions == "ref":
+            return encode_json({**payload, "instructions_ref": self.uri}, compact)
+        body = encode_json(payload, compact)
+        # Drop the payload's closing brace (and the newline before it when indented)
+        return body[:-1 if compact else -2] + "," + self._tails[compact]
+
+
+TWITTER_RESPONSES = ResponseBuilder(TWITTER_GUIDANCE, "instructions://twitter")
+LINKEDIN_RESPONSES = ResponseBuilder(LINKEDIN_GUIDANCE, "instructions://linkedin")
+PERSON_RESPONSES = ResponseBuilder(PERSON_GUIDANCE, "instructions://person")
+
+
+def twitter_run_input(handles: List[str], max_items: int = 3) -> dict:
+    """Build the tweet-scraper input for the given (normalized) handles."""
+    return {
+        "twitterHandles": handles,
+        "maxItems": max_items,
+        "sort": "Latest",
+        "tweetLanguage": "en"
+    }
+
+
+def linkedin_run_input(username: str, limit: int = 5, total_posts: Optional[int] = None) -> dict:
+    """Build the linkedin-profile-posts input for a (normalized) username."""
+    run_input = {
+        "username": username,
+        "limit": limit
+    }
+    # Add total_posts if specified for automatic pagination
+    if total_posts:
+        run_input["total_posts"] = total_posts
+    return run_input
+
+
+def is_retweet(tweet: dict) -> bool:
+    return tweet.get('isRetweet', False)
+
+
+async def select_latest_original(items, is_repost=is_retweet) -> Optional[dict]:
+    """Return the first original (non-repost) item from an async stream, falling back to the first item if all are reposts."""
+    first_item = None
+    async for item in items:
+        if not is_repost(item):
+            return item
+        if first_item is None:
+            first_item = item
+    return first_item
+
 
-# Initialize Apify client
-APIFY_API_TOKEN = os.getenv("APIFY_API_TOKEN")
-if not APIFY_API_TOKEN:
-    raise ValueError("APIFY_API_TOKEN environment variable is required")
+def tweet_author(tweet: dict) -> str:
+    """Return the lowercased handle of a tweet's author."""
+    author = tweet.get('author') or {}
+    handle = author.get('userName') or ''
+    if not handle and '/status/' in tweet.get('url', ''):
+        # URLs look like https://x.com/<handle>/status/<id>
+        handle = tweet['url'].split('/status/')[0].rstrip('/').rsplit('/', 1)[-1]
+    return handle.lower()
+
+
+def parse_post_time(value: str) -> Optional[datetime]:
+    """Parse a tweet createdAt ("Wed Jan 10 12:00:00 +0000 2024") or LinkedIn posted_at date ("2024-01-10 12:00:00")."""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%a %b %d %H:%M:%S %z %Y")
+    except ValueError:
+        pass
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    # LinkedIn dates carry no offset; treat them as UTC so they compare with tweet times
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def post_time(post: dict) -> Optional[datetime]:
+    """Publication time of a formatted tweet or LinkedIn post."""
+    return parse_post_time(post.get("created_at") or post.get("posted_date") or "")
+
+
+def is_older(post: dict, other: dict) -> bool:
+    """True if post was published before other (False when either time is unknown)."""
+    post_at, other_at = post_time(post), post_time(other)
+    return post_at is not None and other_at is not None and post_at < other_at
+
+
+async def reconcile_last_seen(platform: str, identifier: str, latest: Optional[dict],
+                        since_filtered: bool = False) -> Optional[dict]:
+    """Return the newer of a freshly scraped latest post and the stored last-seen one, recording a new one.
+
+    An empty result only means "nothing new" when the run asked for posts since the last-seen one
+    (since_filtered); otherwise the profile really had no posts and None is returned.
+    """
+    state = await in_store(last_seen.get, platform, identifier)
+    if latest is None and not since_filtered:
+        return None
+    if state is not None and (latest is None or is_older(latest, state["post"])):
+        log.info("No new posts since last seen", extra={"platform": platform, "identifier": identifier})
+        metrics.inc("mcp_last_seen_reused_total", platform=platform)
+        return state["post"]
+    if latest is not None and latest.get("url"):
+        posted_at = latest.get("created_at") or latest.get("posted_date")
+        await in_store_best_effort(last_seen.record, platform, identifier, latest["url"], posted_at, latest)
+    return latest
+
+
+def format_tweet(tweet: dict) -> dict:
+    """Extract the fields used for outreach from a raw tweet-scraper item."""
+    author_info = tweet.get('author') or {}
+    return {
+        "text": tweet.get('text', ''),
+        "url": tweet.get('url', ''),
+        "created_at": tweet.get('createdAt', ''),
+        "likes": tweet.get('likeCount', 0),
+        "retweets": tweet.get('retweetCount', 0),
+        "author": {
+            "name": author_info.get('name', ''),
+            "username": tweet_author(tweet),
+        },
+        "platform": "twitter"
+    }
+
+
+def format_linkedin_post(post: dict, username: str) -> dict:
+    """Extract the fields used for outreach from a raw linkedin-profile-posts item."""
+    posted_at = post.get('posted_at', {})
+    author_info = post.get('author', {})
+    stats = post.get('stats', {})
+    return {
+        "text": post.get('text', ''),
+        "url": post.get('url', ''),
+        "post_type": post.get('post_type', ''),
+        "posted_date": posted_at.get('date', ''),
+        "relative_time": posted_at.get('relative', ''),
+        "author": {
+            "name": f"{author_info.get('first_name', '')} {author_info.get('last_name', '')}".strip(),
+            "headline": author_info.get('headline', ''),
+            "username": author_info.get('username', username),
+            "profile_url": author_info.get('profile_url', '')
+        },
+        "engagement": {
+            "total_reactions": stats.get('total_reactions', 0),
+            "comments": stats.get('comments', 0),
+            "reposts": stats.get('reposts', 0),
+            "likes": stats.get('like', 0),
+            "celebrates": stats.get('celebrate', 0),
+            "supports": stats.get('support', 0)
+        },
+        "platform": "linkedin"
+    }
+
+
+# Digest mode: posts fetched when total_posts isn't given, how many distinct terms the topic
+# counter tracks at once, and how much a comment / repost counts relative to a reaction
+LINKEDIN_DIGEST_POSTS = int(os.getenv("LINKEDIN_DIGEST_POSTS", "50"))
+DIGEST_TOPIC_SLOTS = 200
+ENGAGEMENT_WEIGHTS = {"total_reactions": 1, "comments": 2, "reposts": 3}
+
+
+class PostDigest:
+    """Summarizes a profile's posts in one pass with bounded memory: top-K posts by engagement,
+    posting cadence and recurring topics.
+
+    Only the top-K posts are kept; topics are counted with the Misra-Gries algorithm, so at most
+    DIGEST_TOPIC_SLOTS terms are tracked and reported counts are lower bounds.
+    """
+
+    def __init__(self, top_k: int = 3, topic_slots: int = DIGEST_TOPIC_SLOTS):
+        self.top_k = top_k
+        self.topic_slots = topic_slots
+        self.count = 0
+        self._top = []  # Min-heap of (score, -sequence, post)
+        self._totals = Counter()
+        self._topics = {}
+        self._weekdays = Counter()
+        self._newest = self._oldest = self._previous = None
+        self._longest_gap = 0.0
+
+    def add(self, post: dict) -> None:
+        """Fold one formatted LinkedIn post into the digest."""
+        self.count += 1
+        engagement = post.get("engagement", {})
+        self._totals.update({name: engagement.get(name) or 0 for name in ENGAGEMENT_WEIGHTS})
+        score = sum((engagement.get(name) or 0) * weight for name, weight in ENGAGEMENT_WEIGHTS.items())
+        kept = {key: post[key] for key in ("text", "url", "post_type", "posted_date", "engagement") if key in post}
+        entry = (score, -self.count, kept)
+        if len(self._top) < self.top_k:
+            heapq.heappush(self._top, entry)
+        elif entry[:2] > self._top[0][:2]:
+            heapq.heapreplace(self._top, entry)
+
+        posted = post_time(post)
+        if posted is not None:
+            self._weekdays[posted.strftime("%A")] += 1
+            self._newest = max(self._newest or posted, posted)
+            self._oldest = min(self._oldest or posted, posted)
+            if self._previous is not None:
+                self._longest_gap = max(self._longest_gap, abs((self._previous - posted).total_seconds()))
+            self._previous = posted
+
+        self._count_topics(post.get("text") or "")
+
+    def _count_topics(self, text: str) -> None:
+        # Each term counts once per post: hashtags plus longer non-stopwords
+        terms = {tag.lower() for tag in re.findall(r"#\w+", text)}
+        terms |= {w for w in re.findall(r"(?<!#)\b[a-z][a-z'-]{3,}", text.lower()) if w not in STOPWORDS}
+        for term in terms:
+            if term in self._topics:
+                self._topics[term] += 1
+            elif len(self._topics) < self.topic_slots:
+                self._topics[term] = 1
+            else:
+                for tracked in list(self._topics):
+                    self._topics[tracked] -= 1
+                    if not self._topics[tracked]:
+                        del self._topics[tracked]
+
+    def summary(self, topics: int = 5) -> dict:
+        """The digest as a JSON-ready dict."""
+        span_days = (self._newest - self._oldest).total_seconds() / 86400 if self._newest else 0.0
+        dated = sum(self._weekdays.values())
+        recurring = sorted(((count, term) for term, count in self._topics.items() if count > 1), reverse=True)
+        return {
+            "posts_analyzed": self.count,
+            "top_posts": [post for _, _, post in sorted(self._top, reverse=True)],
+            "avg_engagement": {name: round(total / self.count, 1) for name, total in self._totals.items()} if self.count else {},
+            "cadence": {
+                "first_post": self._oldest.date().isoformat() if self._oldest else None,
+                "last_post": self._newest.date().isoformat() if self._newest else None,
+                "posts_per_week": round(dated / max(span_days / 7, 1), 1) if dated else 0,
+                "avg_days_between_posts": round(span_days / (dated - 1), 1) if dated > 1 else None,
+                "longest_gap_days": round(self._longest_gap / 86400, 1),
+                "most_active_day": self._weekdays.most_common(1)[0][0] if dated else None,
+            },
+            "recurring_topics": [{"topic": term, "posts": count} for count, term in recurring[:topics]],
+        }
+
+
+# Actors that can look up a profile's latest post, by platform then actor id (first registered = primary)
+LOOKUP_ACTORS = {}
+
+
+def twitter_since_input(run_input: dict, since: datetime) -> dict:
+    """Restrict tweet-scraper input to tweets from since's day onwards.
+
+    The actor's date filter is day-granular; tweets from earlier that day are weeded out afterwards.
+    """
+    return {**run_input, "start": since.strftime("%Y-%m-%d")}
+
+
+def register_lookup_actor(platform: str, actor_id: str, build_input, fields: List[str], normalize,
+                          is_repost=lambda item: False, first_page_size: int = 3, since_input=None) -> None:
+    """Register an actor for single-profile lookups on a platform.
+
+    build_input(identifier) returns the actor input, fields are the dataset fields to download,
+    is_repost(item) marks items to skip in favour of original posts, and normalize(item) turns a
+    dataset item into the tool's response shape (e.g. latest_tweet). If the actor can filter by
+    date, since_input(run_input, since) returns the input restricted to posts from since onwards.
+    """
+    ACTOR_PLATFORMS.setdefault(actor_id, platform)
+    LOOKUP_ACTORS.setdefault(platform, {})[actor_id] = {
+        "build_input": build_input,
+        "fields": fields,
+        "normalize": normalize,
+        "is_repost": is_repost,
+        "first_page_size": first_page_size,
+        "since_input": since_input,
+    }
+
+
+register_lookup_actor(
+    "twitter", TWITTER_ACTOR_ID,
+    build_input=lambda handle: twitter_run_input([handle]),
+    fields=TWITTER_DATASET_FIELDS,
+    normalize=format_tweet,
+    is_repost=is_retweet,
+    since_input=twitter_since_input,
+)
+
+# Hedging: if the primary run is still going after the given percentile of its recent run times
+# (or delay_secs until HEDGE_MIN_SAMPLES runs have been seen), start the same lookup on the hedge
+# actor (default: a second run of the primary) and keep whichever finishes first
+HEDGE_POLICY = {
+    "twitter": {
+        "enabled": os.getenv("TWITTER_HEDGE", "").lower() in ("1", "true", "yes"),
+        "actor": os.getenv("TWITTER_HEDGE_ACTOR") or TWITTER_ACTOR_ID,
+        "percentile": float(os.getenv("TWITTER_HEDGE_PERCENTILE", "90")),
+        "delay_secs": float(os.getenv("TWITTER_HEDGE_DELAY_SECS", "20")),
+    },
+}
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+
+
+class LatencyTracker:
+    """Rolling window of recent run durations per actor.
+
+    Failed and cancelled runs are recorded with the time they had taken so far, a lower bound of their duration.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples = {}
+
+    def record(self, actor_id: str, seconds: float) -> None:
+        samples = self._samples.get(actor_id)
+        if samples is None:
+            samples = self._samples[actor_id] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def percentile(self, actor_id: str, pct: float) -> Optional[float]:
+        """Nearest-rank percentile of recent durations, or None until HEDGE_MIN_SAMPLES have been recorded."""
+        samples = self._samples.get(actor_id)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+actor_latency = LatencyTracker()
+
+
+async def extract_latest_post(platform: str, actor_id: str, dataset_id: str) -> Optional[dict]:
+    """Return the normalized latest original post from a finished lookup actor dataset, or None if it is empty."""
+    spec = LOOKUP_ACTORS[platform][actor_id]
+    # Stream items until the first original post
+    items = stream_dataset_items(dataset_id, spec["fields"], first_page_size=spec["first_page_size"])
+    item = await select_latest_original(items, spec["is_repost"])
+
+    if not item:
+        return None
+
+    latest_post = spec["normalize"](item)
+    log.debug("Latest post selected", extra={"actor": actor_id, "url": latest_post.get('url')})
+    return latest_post
+
+
+async def run_lookup_actor(platform: str, actor_id: str, identifier: str) -> Optional[dict]:
+    """Run one registered lookup actor and return its normalized latest post, or None if nothing was found.
+
+    If a post was seen for this profile before and the actor supports it, only newer posts are requested;
+    when none turn up the stored post is returned.
+    """
+    spec = LOOKUP_ACTORS[platform][actor_id]
+    run_input = spec["build_input"](identifier)
+    state = await in_store(last_seen.get, platform, identifier)
+    since = parse_post_time(state["posted_at"]) if state else None
+    since_filtered = since is not None and spec["since_input"] is not None
+    if since_filtered:
+        run_input = spec["since_input"](run_input, since)
+    log.debug("Calling Apify actor", extra={"actor": actor_id, "run_input": run_input})
+    started = time.monotonic()
+    try:
+        run = await call_actor(actor_id, run_input)
+    finally:
+        # Runs that fail or are cancelled (e.g. losing a hedge race) still took at least this long; leaving
+        # them out would bias the window towards fast runs and make hedging fire too early
+        actor_latency.record(actor_id, time.monotonic() - started)
+
+    dataset_id = run["defaultDatasetId"]
+    log.info("Actor run completed", extra={"actor": actor_id, "run_id": run.get('id'), "dataset_id": dataset_id})
+    latest_post = await extract_latest_post(platform, actor_id, dataset_id)
+    return await reconcile_last_seen(platform, identifier, latest_post, since_filtered)
+
+
+def _retrieve_result(task: asyncio.Future) -> None:
+    if not task.cancelled():
+        task.exception()  # Losing runs may fail after the winner returned; don't warn about it
+
+
+async def lookup_latest_post(platform: str, identifier: str) -> Optional[dict]:
+    """Look up a profile's latest post with the platform's primary actor, hedged per HEDGE_POLICY.
+
+    When hedging is on and the primary run is slow (or fails) before the hedge delay, the hedge actor
+    is started too; the first successful result wins and the other run is cancelled, which aborts it.
+    """
+    actors = LOOKUP_ACTORS[platform]
+    primary = next(iter(actors))
+    policy = HEDGE_POLICY.get(platform)
+    if not policy or not policy["enabled"]:
+        return await run_lookup_actor(platform, primary, identifier)
+
+    hedge_actor = policy["actor"] if policy["actor"] in actors else primary
+    delay = actor_latency.percentile(primary, policy["percentile"]) or policy["delay_secs"]
+    primary_task = asyncio.ensure_future(run_lookup_actor(platform, primary, identifier))
+    primary_task.add_done_callback(_retrieve_result)
+    tasks = {primary_task: "primary"}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done or primary_task.exception() is not None:
+            log.info("Starting hedge run", extra={"actor": hedge_actor, "reason": "failed" if done else "slow",
+                                                  "after_secs": round(delay, 2)})
+            metrics.inc("mcp_hedged_lookups_total", platform=platform, reason="failed" if done else "slow")
+            hedge_task = asyncio.ensure_future(run_lookup_actor(platform, hedge_actor, identifier))
+            hedge_task.add_done_callback(_retrieve_result)
+            tasks[hedge_task] = "hedge"
+
+        pending = set(tasks)
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if len(tasks) > 1:
+                        metrics.inc("mcp_hedge_wins_total", platform=platform, winner=tasks[task])
+                    return task.result()
+                error = error or task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+
+
+async def scrape_latest_tweet(handle: str) -> Optional[dict]:
+    """Return the latest original tweet for a (normalized) handle, or None if nothing was found."""
+    return await lookup_latest_post("twitter", handle)
+
+
+async def extract_latest_tweet(dataset_id: str, run_input: dict) -> Optional[dict]:
+    """Return the latest original tweet from a finished tweet-scraper dataset, or None if it is empty."""
+    return await extract_latest_post("twitter", TWITTER_ACTOR_ID, dataset_id)
+
+
+async def scrape_tweet_batch(handles: List[str]) -> dict:
+    """Scrape several handles in one actor run and return the latest original tweet per handle.
+
+    A handle maps to None if the run had no tweets from it. Handles are left out when the run hit its
+    item limit before reaching them, since their tweets may simply have been cut off.
+    """
+    run_input = twitter_run_input(handles, max_items=3 * len(handles))
+    # The date filter covers the whole run, so it is only used when every handle has a last-seen post,
+    # starting from the oldest of them
+    states = [await in_store(last_seen.get, "twitter", handle) for handle in handles]
+    since = [parse_post_time(state["posted_at"]) if state else None for state in states]
+    since_filtered = all(since)
+    if since_filtered:
+        run_input = twitter_since_input(run_input, min(since))
+    log.debug("Calling Apify actor", extra={"actor": TWITTER_ACTOR_ID, "handles": len(handles)})
+    run = await call_actor(TWITTER_ACTOR_ID, run_input)
+    log.info("Actor run completed", extra={"actor": TWITTER_ACTOR_ID, "run_id": run.get('id'), "handles": len(handles)})
+
+    # Demultiplex the dataset by author, keeping only the first tweet and first original tweet per handle
+    wanted = set(handles)
+    first_tweets = {}
+    original_tweets = {}
+    read = 0
+    capped = False
+    items = stream_dataset_items(run["defaultDatasetId"], TWITTER_DATASET_FIELDS, first_page_size=DATASET_PAGE_SIZE)
+    async for tweet in items:
+        read += 1
+        author = tweet_author(tweet)
+        if author not in wanted:
+            continue
+        first_tweets.setdefault(author, tweet)
+        if not is_retweet(tweet):
+            original_tweets.setdefault(author, tweet)
+            if len(original_tweets) == len(handles):
+                break
+    else:
+        capped = read >= run_input["maxItems"]
+
+    log.info("Batch demultiplexed", extra={"found": len(first_tweets), "handles": len(handles), "capped": capped})
+
+    latest_tweets = {}
+    for handle in handles:
+        tweet = original_tweets.get(handle) or first_tweets.get(handle)
+        if tweet is not None or not capped:
+            latest_tweets[handle] = await reconcile_last_seen(
+                "twitter", handle, format_tweet(tweet) if tweet else None, since_filtered
+            )
+    return latest_tweets
+
+
+async def scrape_latest_linkedin_post(run_input: dict) -> Optional[dict]:
+    """Run the LinkedIn posts scraper and return the most recent post, or None if nothing was found."""
+    # Run the Actor and wait for it to finish
+    log.debug("Calling Apify actor", extra={"actor": LINKEDIN_ACTOR_ID, "run_input": run_input})
+    run = await call_actor(LINKEDIN_ACTOR_ID, run_input)
+
+    # Get dataset results
+    dataset_id = run["defaultDatasetId"]
+    log.info("Actor run completed", extra={"actor": LINKEDIN_ACTOR_ID, "run_id": run.get('id'), "dataset_id": dataset_id})
+    # The actor has no date filter; a stored post still wins if the scraped one is older
+    latest_post = await extract_latest_linkedin_post(dataset_id, run_input)
+    return await reconcile_last_seen("linkedin", run_input["username"], latest_post)
+
+
+async def extract_latest_linkedin_post(dataset_id: str, run_input: dict) -> Optional[dict]:
+    """Return the most recent post from a finished linkedin-profile-posts dataset, or None if it is empty."""
+    # Get the most recent post (first item) - nothing else needs to be downloaded
+    items = stream_dataset_items(dataset_id, LINKEDIN_DATASET_FIELDS, first_page_size=1)
+    first_item = None
+    async for item in items:
+        first_item = item
+        break
+
+    if not first_item:
+        return None
+
+    latest_post = format_linkedin_post(first_item, run_input["username"])
+    log.debug("Latest LinkedIn post selected", extra={"url": latest_post['url'], "posted_date": latest_post['posted_date']})
+    return latest_post
+
+async def scrape_linkedin_digest(run_input: dict, top_k: int) -> Optional[dict]:
+    """Run the LinkedIn posts scraper and stream every post it returned through a PostDigest.
+
+    Returns {"latest_post", "digest"}, or None if nothing was found.
+    """
+    log.debug("Calling Apify actor", extra={"actor": LINKEDIN_ACTOR_ID, "run_input": run_input})
+    run = await call_actor(LINKEDIN_ACTOR_ID, run_input)
+    log.info("Actor run completed", extra={"actor": LINKEDIN_ACTOR_ID, "run_id": run.get('id'), "dataset_id": run["defaultDatasetId"]})
+
+    digest = PostDigest(top_k)
+    latest = None
+    async for item in stream_dataset_items(run["defaultDatasetId"], LINKEDIN_DATASET_FIELDS, first_page_size=DATASET_PAGE_SIZE):
+        post = format_linkedin_post(item, run_input["username"])
+        latest = latest or post
+        digest.add(post)
+    log.info("Digest built", extra={"posts": digest.count})
+
+    latest_post = await reconcile_last_seen("linkedin", run_input["username"], latest)
+    if latest_post is None:
+        return None
+    return {"latest_post": latest_post, "digest": digest.summary()}
+
+# Per-platform settings used by job mode
+PLATFORMS = {
+    "twitter": {
+        "actor_id": TWITTER_ACTOR_ID,
+        "result_key": "latest_tweet",
+        "extract": extract_latest_tweet,
+        "identifier": lambda run_input: run_input["twitterHandles"][0],
+        "responses": TWITTER_RESPONSES,
+        "not_found": "No tweets found for this handle",
+    },
+    "linkedin": {
+        "actor_id": LINKEDIN_ACTOR_ID,
+        "result_key": "latest_post",
+        "extract": extract_latest_linkedin_post,
+        "identifier": lambda run_input: run_input["username"],
+        "responses": LINKEDIN_RESPONSES,
+        "not_found": "No posts found for this LinkedIn profile",
+    },
+}
+
+
+async def build_run_input(platform: str, identifier: str, limit: int = 5, total_posts: Optional[int] = None) -> dict:
+    """Normalize the identifier and build the actor input for the given platform."""
+    if platform == "twitter":
+        return twitter_run_input([await resolve_identifier("twitter", identifier)])
+    return linkedin_run_input(await resolve_identifier("linkedin", identifier), limit, total_posts)
+
+
+async def refresh_job(job: dict, wait_secs: int = 0, ctx: Optional[Context] = None) -> dict:
+    """Check the actor run behind a job (waiting up to wait_secs) and record its status and result."""
+    platform = PLATFORMS[job["platform"]]
+    started = time.monotonic()
+
+    # A queued job has no run until the scheduler admits it
+    while job["run_id"] is None and job["status"] not in JOB_TERMINAL_STATUSES:
+        remaining = wait_secs - (time.monotonic() - started)
+        if remaining <= 0:
+            return job
+        if ctx is not None:
+            await ctx.report_progress(
+                progress=time.monotonic() - started, total=wait_secs, message="Waiting for a run slot"
+            )
+        await asyncio.sleep(min(1, remaining))
+        job = await in_store(job_store.get, job["job_id"])
+    if job["status"] in JOB_TERMINAL_STATUSES:
+        return job
+
+    run_client = get_client().run(job["run_id"])
+    while True:
+        remaining = wait_secs - (time.monotonic() - started)
+        wait = int(min(JOB_POLL_INTERVAL, remaining)) if remaining >= 1 else 0
+        run = await (run_client.wait_for_finish(wait_secs=wait) if wait else run_client.get())
+        if run is None:
+            await in_store(job_store.update, job["job_id"], "FAILED", error="Actor run not found")
+            return await in_store(job_store.get, job["job_id"])
+        if run["status"] in JOB_TERMINAL_STATUSES or not wait:
+            break
+        if ctx is not None:
+            await ctx.report_progress(
+                progress=time.monotonic() - started, total=wait_secs, message=f"Actor run {run['status']}"
+            )
+
+    status = run["status"]
+    if status == "SUCCEEDED":
+        result = await platform["extract"](job["dataset_id"], job["run_input"])
+        result = await reconcile_last_seen(job["platform"], platform["identifier"](job["run_input"]), result)
+        if result is None:
+            await in_store(job_store.update, job["job_id"], status, error=platform["not_found"])
+        else:
+            cache_key = make_cache_key(job["platform"], job["run_input"])
+            await in_store_best_effort(result_cache.set, cache_key, result, CACHE_TTL[job["platform"]])
+            await in_store(job_store.update, job["job_id"], status, result=result)
+    elif status in JOB_TERMINAL_STATUSES:
+        await in_store(job_store.update, job["job_id"], status, error=f"Actor run {status}")
+    else:
+        await in_store(job_store.update, job["job_id"], status)
+    return await in_store(job_store.get, job["job_id"])
+
+
+def job_response(job: dict) -> dict:
+    """Build the response payload for a job: its result once finished, otherwise its status."""
+    platform = PLATFORMS[job["platform"]]
+    response = {
+        "job_id": job["job_id"],
+        "platform": job["platform"],
+        "status": job["status"],
+    }
+    if job["result"] is not None:
+        response[platform["result_key"]] = job["result"]
+    elif job["error"]:
+        response["error"] = job["error"]
+    else:
+        response["elapsed_secs"] = round(time.time() - job["created_at"])
+    return response
+
+async def fetch_latest_tweet(twitterHandle: str, force_refresh: bool = False) -> dict:
+    """Resolve a handle or name and return {"latest_tweet": ...} from the cache or a scrape, or {"error": ...}."""
+    raw_handle = twitterHandle
+    twitterHandle = await resolve_identifier("twitter", twitterHandle)
+
+    # Simple Actor input - get latest 3 tweets
+    run_input = twitter_run_input([twitterHandle])
+
+    cache_key = make_cache_key("twitter", run_input)
+    latest_tweet = None if force_refresh else await in_store(result_cache.get, cache_key)
+
+    if latest_tweet is not None:
+        log.info("Cache hit", extra={"handle": twitterHandle})
+    elif not force_refresh and await in_store(handle_index.is_known_miss, "twitter", twitterHandle):
+        log.info("Known miss", extra={"handle": twitterHandle})
+        return {"error": "No tweets found for this handle (recent lookup; pass force_refresh=true to retry)"}
+    else:
+        log.info("Starting Apify scraping", extra={"handle": twitterHandle})
+
+        latest_tweet = await inflight_scrapes.run(cache_key, lambda: scrape_latest_tweet(twitterHandle))
+        if not latest_tweet:
+            # Failed runs raise, so this run succeeded and really had no tweets
+            await in_store_best_effort(handle_index.record_miss, "twitter", twitterHandle)
+            return {"error": "No tweets found for this handle"}
+        verified = latest_tweet.get("author", {}).get("username") or twitterHandle
+        await in_store_best_effort(handle_index.learn, "twitter", [raw_handle, twitterHandle], verified)
+        await in_store_best_effort(result_cache.set, cache_key, latest_tweet, CACHE_TTL["twitter"])
+        if verified != twitterHandle:
+            # Later calls resolve to the verified handle, so make them hit the cache too
+            verified_key = make_cache_key("twitter", twitter_run_input([verified]))
+            await in_store_best_effort(result_cache.set, verified_key, latest_tweet, CACHE_TTL["twitter"])
+
+    return {"latest_tweet": latest_tweet}
+
+
+async def fetch_latest_tweets(twitterHandles: List[str], force_refresh: bool = False,
+                              deadline_secs: Optional[float] = None) -> dict:
+    """Resolve handles or names and return {handle: {"latest_tweet": ...} or {"error": ...}}, batching uncached ones."""
+    resolved = {raw: await resolve_identifier("twitter", raw) for raw in twitterHandles if raw and raw.strip()}
+    handles = list(dict.fromkeys(resolved.values()))
+    if not handles:
+        return {}
+
+    results = {}
+    to_scrape = []
+    for handle in handles:
+        cache_key = make_cache_key("twitter", twitter_run_input([handle]))
+        cached = None if force_refresh else await in_store(result_cache.get, cache_key)
+        if cached is not None:
+            results[handle] = {"latest_tweet": cached}
+        elif not force_refresh and await in_store(handle_index.is_known_miss, "twitter", handle):
+            results[handle] = {"error": "No tweets found for this handle (recent lookup; pass force_refresh=true to retry)"}
+        else:
+            to_scrape.append(handle)
+
+    log.info("Batch cache lookup", extra={"cached": len(results), "to_scrape": len(to_scrape)})
+
+    async def scrape_chunk(chunk: List[str]) -> None:
+        try:
+            latest_tweets = await within_deadline(deadline_secs, lambda: scrape_tweet_batch(chunk))
+        except Exception as e:
+            log.error("Batch chunk failed", extra={"handles": len(chunk), "error": str(e)})
+            for handle in chunk:
+                results[handle] = {"error": f"Error: {str(e)}"}
+            return
+        for handle in chunk:
+            if handle not in latest_tweets:
+                results[handle] = {"error": "Error: The batch run hit its item limit before reaching this handle; "
+                                            "look it up on its own"}
+                continue
+            latest_tweet = latest_tweets[handle]
+            if latest_tweet is None:
+                await in_store_best_effort(handle_index.record_miss, "twitter", handle)
+                results[handle] = {"error": "No tweets found for this handle"}
+                continue
+            aliases = [raw for raw, h in resolved.items() if h == handle]
+            await in_store_best_effort(handle_index.learn, "twitter", aliases, handle)
+            cache_key = make_cache_key("twitter", twitter_run_input([handle]))
+            await in_store_best_effort(result_cache.set, cache_key, latest_tweet, CACHE_TTL["twitter"])
+            results[handle] = {"latest_tweet": latest_tweet}
+
+    chunks = [to_scrape[i:i + TWITTER_BATCH_SIZE] for i in range(0, len(to_scrape), TWITTER_BATCH_SIZE)]
+    # Batch runs queue behind interactive ones, but prefetch callers keep their lower priority
+    with run_priority(max(run_priority_var.get(), "batch", key=RUN_PRIORITIES.get)):
+        await asyncio.gather(*(scrape_chunk(chunk) for chunk in chunks))
+
+    return {handle: results[handle] for handle in handles}
+
+
+async def fetch_latest_linkedin_post(username: str, limit: int = 5, total_posts: Optional[int] = None,
+                                     force_refresh: bool = False) -> dict:
+    """Resolve a username, URL or name and return {"latest_post": ...} from the cache or a scrape, or {"error": ...}."""
+    raw_username = username
+    username = await resolve_identifier("linkedin", username)
+
+    # Actor input for LinkedIn
+    run_input = linkedin_run_input(username, limit, total_posts)
+
+    cache_key = make_cache_key("linkedin", run_input)
+    latest_post = None if force_refresh else await in_store(result_cache.get, cache_key)
+
+    if latest_post is not None:
+        log.info("Cache hit", extra={"username": username})
+    elif not force_refresh and await in_store(handle_index.is_known_miss, "linkedin", username):
+        log.info("Known miss", extra={"username": username})
+        return {"error": "No posts found for this LinkedIn profile (recent lookup; pass force_refresh=true to retry)"}
+    else:
+        log.info("Starting Apify scraping", extra={"username": username, "total_posts": total_posts})
 
-client = ApifyClient(APIFY_API_TOKEN)
+        latest_post = await inflight_scrapes.run(cache_key, lambda: scrape_latest_linkedin_post(run_input))
+        if not latest_post:
+            await in_store_best_effort(handle_index.record_miss, "linkedin", username)
+            return {"error": "No posts found for this LinkedIn profile"}
+        author = latest_post.get("author", {})
+        verified = (author.get("username") or username).lower()
+        aliases = [raw_username, username, author.get("profile_url")]
+        await in_store_best_effort(handle_index.learn, "linkedin", aliases, verified)
+        await in_store_best_effort(result_cache.set, cache_key, latest_post, CACHE_TTL["linkedin"])
+
+    return {"latest_post": latest_post}
+
+# Background watchlist prefetch: how often the watchlist is checked for entries due a refresh
+# (seconds, 0 disables the background loop) and the most actor runs it starts per minute
+WATCHLIST_POLL_SECS = int(os.getenv("WATCHLIST_POLL_SECS", "60"))
+WATCHLIST_RUNS_PER_MINUTE = float(os.getenv("WATCHLIST_RUNS_PER_MINUTE", "6"))
+if WATCHLIST_RUNS_PER_MINUTE <= 0:
+    raise ValueError("WATCHLIST_RUNS_PER_MINUTE must be greater than 0 (set WATCHLIST_POLL_SECS=0 to stop prefetching)")
+# How long entries added without an explicit duration stay on the watchlist (hours)
+WATCHLIST_HOURS = float(os.getenv("WATCHLIST_HOURS", "48"))
+
+_prefetch_task = None
+
+
+def prefetch_status(outcome: dict) -> str:
+    """Classify a fetch result as "ok", "miss" (profile has no posts) or "error"."""
+    if "error" not in outcome:
+        return "ok"
+    return "error" if outcome["error"].startswith("Error:") else "miss"
+
+
+async def prefetch_watchlist() -> int:
+    """Scrape every watchlist entry that is due into the result cache; returns the number of actor runs used.
+
+    Twitter handles share batched runs; runs are queued at prefetch priority and spaced out to
+    WATCHLIST_RUNS_PER_MINUTE so interactive lookups always get through first.
+    """
+    due = await in_store(watchlist.due)
+    if not due:
+        return 0
+    handles = [identifier for platform, identifier in due if platform == "twitter"]
+    units = [("twitter", handles[i:i + TWITTER_BATCH_SIZE]) for i in range(0, len(handles), TWITTER_BATCH_SIZE)]
+    units += [("linkedin", [identifier]) for platform, identifier in due if platform == "linkedin"]
+    # With several workers, one of them runs each pass
+    lease_secs = len(units) * (60 / WATCHLIST_RUNS_PER_MINUTE + TOOL_DEADLINE_SECS)
+    if leases is not None and not await asyncio.to_thread(leases.acquire, "prefetch", lease_secs):
+        return 0
+    log.info("Prefetching watchlist", extra={"due": len(due), "runs": len(units)})
+
+    tool_token = tool_var.set("prefetch")
+    try:
+        with run_priority("prefetch"):
+            for index, (platform, identifiers) in enumerate(units):
+                if index:
+                    await asyncio.sleep(60 / WATCHLIST_RUNS_PER_MINUTE)
+                if platform == "twitter":
+                    resolved = {raw: await resolve_identifier("twitter", raw) for raw in identifiers}
+                    results = await fetch_latest_tweets(identifiers, force_refresh=True)
+                    # A handle the batch returned nothing for wasn't refreshed, so it must not count as "ok"
+                    outcomes = {
+                        raw: results.get(handle, {"error": "Error: No result returned for this handle"})
+                        for raw, handle in resolved.items()
+                    }
+                else:
+                    try:
+                        outcome = await within_deadline(
+                            None, lambda: fetch_latest_linkedin_post(identifiers[0], force_refresh=True)
+                        )
+                    except Exception as e:
+                        outcome = {"error": f"Error: {str(e)}"}
+                    outcomes = {identifiers[0]: outcome}
+                for identifier, outcome in outcomes.items():
+                    await in_store_best_effort(watchlist.mark, platform, identifier, prefetch_status(outcome))
+    finally:
+        tool_var.reset(tool_token)
+        if leases is not None:
+            await asyncio.to_thread(leases.release, "prefetch")
+    log.info("Watchlist prefetched", extra={"profiles": len(due), "runs": len(units)})
+    return len(units)
+
+
+async def prefetch_loop() -> None:
+    request_id_var.set("prefetch")
+    while True:
+        try:
+            await prefetch_watchlist()
+        except Exception as e:
+            log.error("Watchlist prefetch failed", extra={"error": str(e)})
+        await asyncio.sleep(WATCHLIST_POLL_SECS)
+
+
+def start_prefetcher() -> None:
+    """Start the background watchlist prefetch loop on the running event loop, once per process."""
+    global _prefetch_task
+    if WATCHLIST_POLL_SECS > 0 and (_prefetch_task is None or _prefetch_task.done()):
+        _prefetch_task = asyncio.get_running_loop().create_task(prefetch_loop())
+
+async def fetch_linkedin_digest(username: str, limit: int = 5, total_posts: Optional[int] = None, top_k: int = 3,
+                                force_refresh: bool = False) -> dict:
+    """Resolve a username, URL or name and return {"latest_post", "digest"} from the cache or a scrape, or {"error": ...}."""
+    raw_username = username
+    username = await resolve_identifier("linkedin", username)
+    run_input = linkedin_run_input(username, limit, total_posts or LINKEDIN_DIGEST_POSTS)
+
+    cache_key = make_cache_key("linkedin-digest", {**run_input, "top_k": top_k})
+    result = None if force_refresh else await in_store(result_cache.get, cache_key)
+
+    if result is not None:
+        log.info("Cache hit", extra={"username": username, "digest": True})
+    elif not force_refresh and await in_store(handle_index.is_known_miss, "linkedin", username):
+        log.info("Known miss", extra={"username": username})
+        return {"error": "No posts found for this LinkedIn profile (recent lookup; pass force_refresh=true to retry)"}
+    else:
+        log.info("Starting Apify scraping", extra={"username": username, "total_posts": run_input["total_posts"], "digest": True})
+
+        result = await inflight_scrapes.run(cache_key, lambda: scrape_linkedin_digest(run_input, top_k))
+        if not result:
+            await in_store_best_effort(handle_index.record_miss, "linkedin", username)
+            return {"error": "No posts found for this LinkedIn profile"}
+        author = result["latest_post"].get("author", {})
+        verified = (author.get("username") or username).lower()
+        aliases = [raw_username, username, author.get("profile_url")]
+        await in_store_best_effort(handle_index.learn, "linkedin", aliases, verified)
+        await in_store_best_effort(result_cache.set, cache_key, result, CACHE_TTL["linkedin"])
+        # The same run answers a plain lookup with these pagination settings
+        post_key = make_cache_key("linkedin", run_input)
+        await in_store_best_effort(result_cache.set, post_key, result["latest_post"], CACHE_TTL["linkedin"])
+
+    return result
+
+# "http" (default, for ngrok/remote clients) or "stdio" (for clients that launch the server, e.g. Claude Desktop)
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "http").lower()
+
+# HTTP port for the MCP server
+PORT = int(os.getenv("PORT", "8000"))
 
 # Create FastMCP server
 mcp = FastMCP(name="Social Media Cold Outreach Assistant")
 
-print("✅ MCP Server initialized successfully")
+log.info("MCP Server initialized successfully")
 
 @mcp.tool
-@weave.op()
-def scrape_twitter_handles(twitterHandle: str, maxItems: int = 3) -> str:
+@traced
+async def scrape_twitter_handles(twitterHandle: str, maxItems: int = 3, force_refresh: bool = False,
+                                 compact: bool = COMPACT_RESPONSES, instructions: str = DEFAULT_INSTRUCTIONS,
+                                 deadline_secs: Optional[float] = None, max_chars: int = RESPONSE_MAX_CHARS) -> str:
     """
     Helps cold approach, reach out to, or engage with someone on Twitter/X by analyzing their latest tweet.
     Use this when users want to: cold approach, reach out, engage with, contact, message, or connect with someone.
@@ -54,103 +2488,75 @@ def scrape_twitter_handles(twitterHandle: str, maxItems: int = 3) -> str:
     Args:
         twitterHandle: Twitter/X handle to analyze (without @) - can be username or full name
         maxItems: Number of tweets to fetch (default: 3, but only the latest is used for engagement)
+        force_refresh: Skip the result cache and scrape fresh data (default: False)
+        compact: Return minified JSON (default: server setting, normally False)
+        instructions: 'full' includes the message-writing instructions, 'ref' replaces them with a
+            resource URI to read once, 'none' omits them (default: 'full')
+        deadline_secs: Give up (and abort the actor run) after this many seconds (default: server setting, 300)
+        max_chars: Fit the response in about this many characters (~4 per token) by condensing post
+            text to its key sentences and dropping empty fields (default: server setting, 0 = no limit)
 
     Returns:
         JSON with latest tweet and instructions for generating a funny, engaging message
     """
-    print(f"🔧 MCP Tool called with handle: {twitterHandle}, maxItems: {maxItems} (using latest tweet only)", flush=True)
+    log.info("Tool called", extra={"tool": "scrape_twitter_handles", "handle": twitterHandle})
 
     if not twitterHandle:
         return json.dumps({"error": "No Twitter handle provided"})
 
-    # If the handle looks like a full name (e.g., "First Last"), convert to joined format "firstlast"
-    if " " in twitterHandle and not twitterHandle.startswith("http"):
-        twitterHandle = twitterHandle.strip().replace(" ", "").lower()
-
     try:
-        print(f"🔄 Starting Apify scraping for @{twitterHandle}", flush=True)
-
-        # Simple Actor input - get latest 3 tweets
-        run_input = {
-            "twitterHandles": [twitterHandle],
-            "maxItems": 3,
-            "sort": "Latest",
-            "tweetLanguage": "en"
-        }
-        print(f"📝 Apify input: {run_input}", flush=True)
+        result = await within_deadline(deadline_secs, lambda: fetch_latest_tweet(twitterHandle, force_refresh))
+        if "error" in result:
+            return json.dumps(result)
 
-        # Run the Actor and wait for it to finish
-        print("🚀 Calling Apify actor...", flush=True)
-        run = client.actor("apidojo/tweet-scraper").call(run_input=run_input)
-        print(f"✅ Actor run completed: {run.get('id', 'unknown')}", flush=True)
-
-        # Get dataset results
-        dataset_id = run["defaultDatasetId"]
-        print(f"📊 Dataset ID: {dataset_id}", flush=True)
-
-        # Collect all items
-        items = []
-        for item in client.dataset(dataset_id).iterate_items():
-            items.append(item)
-
-        print(f"📦 Collected {len(items)} tweets", flush=True)
-
-        # Find the first non-retweet
-        latest_original_tweet = None
-        for tweet in items:
-            if not tweet.get('isRetweet', False):
-                latest_original_tweet = tweet
-                break
+        # Return structured response with instructions
+        return TWITTER_RESPONSES.build(result, compact, instructions, max_chars)
 
-        if not latest_original_tweet:
-            # If all are retweets, just use the first one
-            latest_original_tweet = items[0] if items else None
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        log.error("Tool failed", extra={"error": str(e)})
+        return json.dumps({"error": error_msg})
 
-        if not latest_original_tweet:
-            return json.dumps({
-                "error": "No tweets found for this handle"
-            })
+@mcp.tool
+@traced
+async def scrape_twitter_handles_batch(twitterHandles: List[str], force_refresh: bool = False,
+                                       compact: bool = COMPACT_RESPONSES,
+                                       instructions: str = DEFAULT_INSTRUCTIONS,
+                                       deadline_secs: Optional[float] = None,
+                                       max_chars: int = RESPONSE_MAX_CHARS) -> str:
+    """
+    Helps prepare cold outreach to many people on Twitter/X at once (e.g. an event attendee list)
+    by analyzing each person's latest tweet.
 
-        # Extract key information
-        tweet_text = latest_original_tweet.get('text', '')
-        tweet_url = latest_original_tweet.get('url', '')
-        created_at = latest_original_tweet.get('createdAt', '')
+    Handles are scraped together in a few chunked actor runs instead of one run per person.
 
-        print(f"📝 Latest tweet: {tweet_text[:100]}...", flush=True)
+    Args:
+        twitterHandles: List of Twitter/X handles (without @) - each can be a username or full name
+        force_refresh: Skip the result cache and scrape fresh data (default: False)
+        compact: Return minified JSON (default: server setting, normally False)
+        instructions: 'full' includes the message-writing instructions, 'ref' replaces them with a
+            resource URI to read once, 'none' omits them (default: 'full')
+        deadline_secs: Give up (and abort the actor runs) after this many seconds (default: server setting, 300)
+        max_chars: Fit the response in about this many characters (~4 per token) by condensing post
+            text to its key sentences and dropping empty fields (default: server setting, 0 = no limit)
 
-        # Return structured response with instructions
-        response = {
-            "latest_tweet": {
-                "text": tweet_text,
-                "url": tweet_url,
-                "created_at": created_at,
-                "likes": latest_original_tweet.get('likeCount', 0),
-                "retweets": latest_original_tweet.get('retweetCount', 0),
-                "platform": "twitter"
-            },
-            "agent_instruction": "Based on the tweet above, generate a witty, clever conversation starter with playful observations. Be cool and fun with smart wordplay or unexpected angles on their story.",
-            "context": "You're at the same event as this person and want to approach them naturally. Create an opening line that references their work without being awkward or overly flattering. Make it conversational and genuine.",
-            "requirements": [
-                "Be witty and playful with clever observations or wordplay",
-                "Use unexpected angles or fun metaphors (like the breakfast/eggs example)",
-                "Be casual and cool - show intelligence through humor",
-                "Keep it short and punchy (1-2 sentences max)",
-                "Make playful observations about their situation or story",
-                "NEVER use 'I saw', 'I heard', 'I read', 'I know' - just make observations",
-                "Think 'witty friend making clever comments at a party'"
-            ]
-        }
+    Returns:
+        JSON with the latest tweet (or an error) per handle and instructions for generating engaging messages
+    """
+    log.info("Tool called", extra={"tool": "scrape_twitter_handles_batch", "handles": len(twitterHandles)})
 
-        return json.dumps(response, indent=2, ensure_ascii=False)
+    results = await fetch_latest_tweets(twitterHandles, force_refresh, deadline_secs)
+    if not results:
+        return json.dumps({"error": "No Twitter handles provided"})
 
-    except Exception as e:
-        error_msg = f"Error: {str(e)}"
-        print(f"❌ {error_msg}", flush=True)
-        return json.dumps({"error": error_msg})
+    return TWITTER_RESPONSES.build({"results": results}, compact, instructions, max_chars)
 
 @mcp.tool
-@weave.op()
-def scrape_linkedin_profile(username: str, limit: int = 5, total_posts: Optional[int] = None) -> str:
+@traced
+async def scrape_linkedin_profile(username: str, limit: int = 5, total_posts: Optional[int] = None, force_refresh: bool = False,
+                                  compact: bool = COMPACT_RESPONSES, instructions: str = DEFAULT_INSTRUCTIONS,
+                                  deadline_secs: Optional[float] = None, max_chars: int = RESPONSE_MAX_CHARS,
+                                  digest: bool = False, top_k: int = 3) -> str:
     """
     Helps cold approach, reach out to, or engage with someone on LinkedIn by analyzing their recent posts.
     Use this when users want to: cold approach, reach out, engage with, contact, message, or connect with someone on LinkedIn.
@@ -162,133 +2568,397 @@ def scrape_linkedin_profile(username: str, limit: int = 5, total_posts: Optional
         username: LinkedIn username (e.g., 'satyanadella' or full URL 'linkedin.com/in/satyanadella')
         limit: Number of posts per page (default: 5, max: 100)
         total_posts: If set, enables automatic pagination to fetch this many posts total
+        force_refresh: Skip the result cache and scrape fresh data (default: False)
+        compact: Return minified JSON (default: server setting, normally False)
+        instructions: 'full' includes the message-writing instructions, 'ref' replaces them with a
+            resource URI to read once, 'none' omits them (default: 'full')
+        deadline_secs: Give up (and abort the actor run) after this many seconds (default: server setting, 300)
+        max_chars: Fit the response in about this many characters (~4 per token) by condensing post
+            text to its key sentences and dropping empty fields (default: server setting, 0 = no limit)
+        digest: Also summarize all fetched posts (total_posts, default 50): the top_k posts by
+            engagement, posting cadence and recurring topics (default: False)
+        top_k: Number of top posts in the digest (default: 3, max: 10)
 
     Returns:
-        JSON with latest post and instructions for generating a professional, engaging message
+        JSON with latest post (plus the digest, if requested) and instructions for generating a professional, engaging message
     """
-    print(f"🔧 MCP Tool called for LinkedIn profile: {username}, limit: {limit}", flush=True)
+    log.info("Tool called", extra={"tool": "scrape_linkedin_profile", "username": username, "limit": limit, "digest": digest})
 
     if not username:
         return json.dumps({"error": "No LinkedIn username provided"})
 
     try:
-        print(f"🔄 Starting Apify scraping for LinkedIn profile: {username}", flush=True)
-
-        # Extract username from URL if provided
-        if 'linkedin.com/in/' in username:
-            username = username.split('linkedin.com/in/')[-1].strip('/')
-        
-        # If the username looks like a full name (e.g., "First Last"), convert to LinkedIn slug format "first-last"
-        if " " in username and not username.startswith("http"):
-            username = username.strip().lower().replace(" ", "-")
-
-        # Actor input for LinkedIn
-        run_input = {
-            "username": username,
-            "limit": limit
-        }
+        top_k = max(1, min(top_k, 10))
+        result = await within_deadline(deadline_secs, lambda: (
+            fetch_linkedin_digest(username, limit, total_posts, top_k, force_refresh) if digest
+            else fetch_latest_linkedin_post(username, limit, total_posts, force_refresh)
+        ))
+        if "error" in result:
+            return json.dumps(result)
+
+        # Return structured response with instructions
+        return LINKEDIN_RESPONSES.build(result, compact, instructions, max_chars)
 
-        # Add total_posts if specified for automatic pagination
-        if total_posts:
-            run_input["total_posts"] = total_posts
-            print(f"📝 Fetching up to {total_posts} total posts with pagination", flush=True)
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        log.error("Tool failed", extra={"error": str(e)})
+        return json.dumps({"error": error_msg})
+
+@mcp.tool
+@traced
+async def scrape_person(name: str, twitterHandle: Optional[str] = None, linkedinUsername: Optional[str] = None,
+                        force_refresh: bool = False, compact: bool = COMPACT_RESPONSES,
+                        instructions: str = DEFAULT_INSTRUCTIONS, deadline_secs: Optional[float] = None,
+                        max_chars: int = RESPONSE_MAX_CHARS) -> str:
+    """
+    Helps cold approach someone using both their latest tweet and their latest LinkedIn post.
+    Use this instead of calling the Twitter and LinkedIn tools one after the other for the same person.
 
-        print(f"📝 Apify input: {run_input}", flush=True)
+    Both platforms are scraped at the same time. If one of them fails or runs past the deadline,
+    the other's result is still returned and the response is marked partial.
 
-        # Run the Actor and wait for it to finish
-        print("🚀 Calling Apify LinkedIn actor...", flush=True)
-        run = client.actor("apimaestro/linkedin-profile-posts").call(run_input=run_input)
-        print(f"✅ Actor run completed: {run.get('id', 'unknown')}", flush=True)
+    Args:
+        name: The person's full name (used for any platform without an explicit handle)
+        twitterHandle: Twitter/X handle, if known
+        linkedinUsername: LinkedIn username or profile URL, if known
+        force_refresh: Skip the result cache and scrape fresh data (default: False)
+        compact: Return minified JSON (default: server setting, normally False)
+        instructions: 'full' includes the message-writing instructions, 'ref' replaces them with a
+            resource URI to read once, 'none' omits them (default: 'full')
+        deadline_secs: Return whatever has finished after this many seconds, aborting the other
+            actor run (default: server setting, 300)
+        max_chars: Fit the response in about this many characters (~4 per token) by condensing post
+            text to its key sentences and dropping empty fields (default: server setting, 0 = no limit)
 
-        # Get dataset results
-        dataset_id = run["defaultDatasetId"]
-        print(f"📊 Dataset ID: {dataset_id}", flush=True)
+    Returns:
+        JSON with the latest tweet and LinkedIn post (or an error for each) and instructions
+        for generating an engaging message
+    """
+    log.info("Tool called", extra={"tool": "scrape_person", "person": name})
 
-        # Collect all items
-        items = []
-        for item in client.dataset(dataset_id).iterate_items():
-            items.append(item)
+    if not (name or twitterHandle or linkedinUsername):
+        return json.dumps({"error": "No name or handle provided"})
 
-        print(f"📦 Collected {len(items)} LinkedIn posts", flush=True)
+    async def lookup(identifier: Optional[str], fetch) -> dict:
+        # A platform with neither a handle nor a name to guess from is skipped, not scraped
+        if not (identifier and identifier.strip()):
+            return {"error": "No identifier provided"}
+        try:
+            return await within_deadline(deadline_secs, lambda: fetch(identifier))
+        except Exception as e:
+            log.error("Platform lookup failed", extra={"error": str(e)})
+            return {"error": f"Error: {str(e)}"}
 
-        if not items:
-            return json.dumps({
-                "error": "No posts found for this LinkedIn profile"
-            })
+    twitter, linkedin = await asyncio.gather(
+        lookup(twitterHandle or name, lambda handle: fetch_latest_tweet(handle, force_refresh)),
+        lookup(linkedinUsername or name,
+               lambda username: fetch_latest_linkedin_post(username, force_refresh=force_refresh)),
+    )
+    if "error" in twitter and "error" in linkedin:
+        return json.dumps({"error": "No posts found on either platform", "twitter": twitter, "linkedin": linkedin})
 
-        # Get the most recent post (first item)
-        latest_post = items[0]
+    response = {
+        "person": name,
+        "twitter": twitter,
+        "linkedin": linkedin,
+        "partial": "error" in twitter or "error" in linkedin,
+    }
+    return PERSON_RESPONSES.build(response, compact, instructions, max_chars)
 
-        # Extract key information
-        post_text = latest_post.get('text', '')
-        post_url = latest_post.get('url', '')
-        posted_at = latest_post.get('posted_at', {})
-        post_date = posted_at.get('date', '')
-        relative_time = posted_at.get('relative', '')
-        author_info = latest_post.get('author', {})
-        stats = latest_post.get('stats', {})
-        post_type = latest_post.get('post_type', '')
+@mcp.tool
+@traced
+async def start_scrape(platform: str, identifier: str, limit: int = 5, total_posts: Optional[int] = None,
+                       force_refresh: bool = False) -> str:
+    """
+    Starts a Twitter/X or LinkedIn scrape in the background and returns a job id right away.
+    Use this instead of the scrape tools for long runs (e.g. LinkedIn with total_posts), then
+    call get_scrape_result with the job id to collect the latest post.
 
-        print(f"📝 Latest LinkedIn post: {post_text[:100]}...", flush=True)
-        print(f"📅 Posted: {post_date} ({relative_time})", flush=True)
+    Args:
+        platform: 'twitter' or 'linkedin'
+        identifier: Twitter handle, LinkedIn username/profile URL, or full name
+        limit: LinkedIn posts per page (default: 5, ignored for Twitter)
+        total_posts: LinkedIn only - enables automatic pagination to fetch this many posts total
+        force_refresh: Skip the result cache and scrape fresh data (default: False)
 
-        # Return structured response with instructions
-        response = {
-            "latest_post": {
-                "text": post_text,
-                "url": post_url,
-                "post_type": post_type,
-                "posted_date": post_date,
-                "relative_time": relative_time,
-                "author": {
-                    "name": f"{author_info.get('first_name', '')} {author_info.get('last_name', '')}".strip(),
-                    "headline": author_info.get('headline', ''),
-                    "username": author_info.get('username', username),
-                    "profile_url": author_info.get('profile_url', '')
-                },
-                "engagement": {
-                    "total_reactions": stats.get('total_reactions', 0),
-                    "comments": stats.get('comments', 0),
-                    "reposts": stats.get('reposts', 0),
-                    "likes": stats.get('like', 0),
-                    "celebrates": stats.get('celebrate', 0),
-                    "supports": stats.get('support', 0)
-                },
-                "platform": "linkedin"
-            },
-            "agent_instruction": "Based on the LinkedIn post above, generate a witty, playful conversation starter with clever observations about their achievement. Be fun and cool with smart wordplay.",
-            "context": "You're at the same event as this person and want to start a conversation referencing their recent achievement. Make it sound natural and conversational, like you just recognized them.",
-            "requirements": [
-                "Be witty and playful with clever observations or wordplay",
-                "Use unexpected angles or fun metaphors about their achievement",
-                "Be casual and cool - show intelligence through humor",
-                "Keep it short and punchy (1-2 sentences max)",
-                "Make playful observations about their situation or work",
-                "NEVER use 'I' followed by any verb - just make witty observations",
-                "Think 'witty friend making clever comments about their success'"
-            ]
-        }
+    Returns:
+        JSON with the job id and its initial status
+    """
+    log.info("Tool called", extra={"tool": "start_scrape", "platform": platform, "identifier": identifier})
+
+    platform = platform.strip().lower()
+    if platform not in PLATFORMS:
+        return json.dumps({"error": f"Unsupported platform: {platform} (use 'twitter' or 'linkedin')"})
+    if not identifier:
+        return json.dumps({"error": "No identifier provided"})
+
+    try:
+        run_input = await build_run_input(platform, identifier, limit, total_posts)
+        cached = None if force_refresh else await in_store(result_cache.get, make_cache_key(platform, run_input))
+
+        if cached is not None:
+            job_id = await in_store(job_store.create, platform, run_input, "SUCCEEDED", result=cached)
+            log.info("Cache hit - job already finished", extra={"job_id": job_id})
+        else:
+            # Take a place in the run queue (or fail fast if it's full); the run starts once admitted
+            actor_id = PLATFORMS[platform]["actor_id"]
+            admission = run_scheduler.enqueue(actor_id, run_priority_var.get())
+            try:
+                job_id = await in_store(job_store.create, platform, run_input, "QUEUED")
+            except BaseException:
+                run_scheduler.withdraw(actor_id, admission)
+                raise
+            queue_job_run(job_id, actor_id, run_input, admission)
+            log.info("Queued actor run", extra={"job_id": job_id})
+
+        job = await in_store(job_store.get, job_id)
+        return json.dumps({"job_id": job_id, "platform": platform, "status": job["status"]})
+
+    except Exception as e:
+        error_msg = f"Error: {str(e)}"
+        log.error("Tool failed", extra={"error": str(e)})
+        return json.dumps({"error": error_msg})
+
+@mcp.tool
+@traced
+async def get_scrape_result(job_id: str, wait_secs: int = 0, compact: bool = COMPACT_RESPONSES,
+                            instructions: str = DEFAULT_INSTRUCTIONS, max_chars: int = RESPONSE_MAX_CHARS,
+                            ctx: Context = None) -> str:
+    """
+    Returns the status of a scrape started with start_scrape, or its latest post and
+    engagement instructions once the job has finished.
+
+    Args:
+        job_id: Job id returned by start_scrape
+        wait_secs: Wait up to this many seconds for the job to finish, sending progress
+            notifications meanwhile (default: 0, just check the current status)
+        compact: Return minified JSON (default: server setting, normally False)
+        instructions: 'full' includes the message-writing instructions, 'ref' replaces them with a
+            resource URI to read once, 'none' omits them (default: 'full')
+        max_chars: Fit the response in about this many characters (~4 per token) by condensing post
+            text to its key sentences and dropping empty fields (default: server setting, 0 = no limit)
 
-        return json.dumps(response, indent=2, ensure_ascii=False)
+    Returns:
+        JSON with the job status, plus the latest tweet/post and instructions (or an error) when finished
+    """
+    log.info("Tool called", extra={"tool": "get_scrape_result", "job_id": job_id})
+
+    job = await in_store(job_store.get, job_id)
+    if job is None:
+        return json.dumps({"error": f"Unknown job id: {job_id}"})
+
+    try:
+        if job["status"] not in JOB_TERMINAL_STATUSES:
+            job = await refresh_job(job, wait_secs, ctx)
+        response = job_response(job)
+        if job["result"] is None:
+            return encode_json(response, compact)
+        return PLATFORMS[job["platform"]]["responses"].build(response, compact, instructions, max_chars)
 
     except Exception as e:
         error_msg = f"Error: {str(e)}"
-        print(f"❌ {error_msg}", flush=True)
+        log.error("Tool failed", extra={"error": str(e)})
         return json.dumps({"error": error_msg})
 
+@mcp.tool
+@traced
+async def add_to_watchlist(twitterHandles: Optional[List[str]] = None, linkedinUsernames: Optional[List[str]] = None,
+                           hours: float = WATCHLIST_HOURS) -> str:
+    """
+    Adds people to the watchlist so their latest posts are scraped in the background ahead of time.
+    Use this when users share a list of people they'll meet later (e.g. an event attendee list);
+    lookups for them during the event are then answered instantly from the cache.
+
+    Args:
+        twitterHandles: Twitter/X handles or full names to watch
+        linkedinUsernames: LinkedIn usernames, profile URLs or full names to watch
+        hours: Keep these people warm for this many hours (default: 48)
+
+    Returns:
+        JSON with how many profiles were added and how many are being watched in total
+    """
+    log.info("Tool called", extra={"tool": "add_to_watchlist",
+                                   "handles": len(twitterHandles or []), "usernames": len(linkedinUsernames or [])})
+
+    added = await in_store(watchlist.add, "twitter", twitterHandles or [], hours)
+    added += await in_store(watchlist.add, "linkedin", linkedinUsernames or [], hours)
+    if not added:
+        return json.dumps({"error": "No Twitter handles or LinkedIn usernames provided"})
+    start_prefetcher()
+
+    runs = math.ceil(len(twitterHandles or []) / TWITTER_BATCH_SIZE) + len(linkedinUsernames or [])
+    return json.dumps({
+        "added": added,
+        "watching": len(await in_store(watchlist.entries)),
+        "estimated_warmup_mins": math.ceil(runs / WATCHLIST_RUNS_PER_MINUTE),
+    })
+
+@mcp.tool
+@traced
+async def get_watchlist() -> str:
+    """
+    Lists the people on the watchlist and whether their latest post has been prefetched yet.
+
+    Returns:
+        JSON with each watched profile, its prefetch status and when it leaves the watchlist
+    """
+    log.info("Tool called", extra={"tool": "get_watchlist"})
+
+    now = time.time()
+    watched = await in_store(watchlist.entries)
+    entries = [
+        {
+            "platform": entry["platform"],
+            "identifier": entry["identifier"],
+            "status": entry["last_status"] or "pending",
+            "prefetched_mins_ago": round((now - entry["last_prefetched_at"]) / 60) if entry["last_prefetched_at"] else None,
+            "expires_in_hours": round((entry["expires_at"] - now) / 3600, 1),
+        }
+        for entry in watched
+    ]
+    return json.dumps({"watching": len(entries), "entries": entries})
+
+@mcp.resource("instructions://twitter", mime_type="application/json")
+def twitter_instructions() -> str:
+    """Message-writing instructions for Twitter/X results returned with instructions='ref'."""
+    return TWITTER_RESPONSES.guidance_json
+
+@mcp.resource("instructions://linkedin", mime_type="application/json")
+def linkedin_instructions() -> str:
+    """Message-writing instructions for LinkedIn results returned with instructions='ref'."""
+    return LINKEDIN_RESPONSES.guidance_json
+
+@mcp.resource("instructions://person", mime_type="application/json")
+def person_instructions() -> str:
+    """Message-writing instructions for scrape_person results returned with instructions='ref'."""
+    return PERSON_RESPONSES.guidance_json
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """Prometheus scrape endpoint (HTTP transport only)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+async def serve(**transport_kwargs) -> None:
+    """Run the MCP server with the watchlist prefetcher alongside it."""
+    start_prefetcher()
+    await mcp.run_async(**transport_kwargs)
+
+
+def create_worker_app():
+    """ASGI app for one of MCP_WORKERS HTTP worker processes, each with its own watchlist prefetcher.
+
+    Sessions are stateless so any worker can serve any request.
+    """
+    app = mcp.http_app(path="/mcp", stateless_http=True)
+    mcp_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app):
+        start_prefetcher()
+        async with mcp_lifespan(app):
+            yield
+
+    app.router.lifespan_context = lifespan
+    return app
+
+
+def check_startup() -> bool:
+    """Report import and init time per component; returns False if startup exceeds STARTUP_BUDGET_MS."""
+    # Import the server in a fresh interpreter to measure cold import cost per package
+    here = os.path.dirname(os.path.abspath(__file__))
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                          cwd=here, capture_output=True, text=True)
+    if proc.returncode != 0:
+        print(f"❌ Importing main.py failed:\n{proc.stderr[-2000:]}")
+        return False
+
+    import_ms = {}
+    for line in proc.stderr.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[1].strip().isdigit():
+            import_ms.setdefault(parts[2].strip(), int(parts[1]) / 1000)
+
+    timings = {f"import {name}": import_ms[name]
+               for name in ("dotenv", "fastmcp", "sqlite3", "apify_client", "weave") if name in import_ms}
+    startup_ms = import_ms.get("main", 0.0)
+    timings["import main.py (startup total)"] = startup_ms
+
+    # Components initialized lazily on first use
+    started = time.perf_counter()
+    get_client()
+    timings["apify client (first tool call)"] = (time.perf_counter() - started) * 1000
+    if WANDB_API_KEY:
+        started = time.perf_counter()
+        init_tracing()
+        timings["weave import + init (background)"] = (time.perf_counter() - started) * 1000
+
+    print("⏱️ Startup report")
+    for component, ms in timings.items():
+        print(f"  {component:<36} {ms:>8.1f} ms")
+
+    within_budget = startup_ms <= STARTUP_BUDGET_MS
+    print(f"{'✅' if within_budget else '❌'} Startup {startup_ms:.0f} ms (budget {STARTUP_BUDGET_MS} ms)")
+    return within_budget
+
+
 if __name__ == "__main__":
+    if "--check-startup" in sys.argv:
+        sys.exit(0 if check_startup() else 1)
+
+    # Register people ahead of an event: --watch twitter:handle linkedin:username ... (or a file
+    # with one entry per line), then --prefetch to warm the cache now instead of in the background
+    if "--watch" in sys.argv:
+        entries = {"twitter": [], "linkedin": []}
+        for arg in sys.argv[sys.argv.index("--watch") + 1:]:
+            if arg.startswith("--"):
+                break
+            lines = open(arg, encoding="utf-8").read().splitlines() if os.path.isfile(arg) else [arg]
+            for line in filter(None, map(str.strip, lines)):
+                platform, _, identifier = line.partition(":")
+                if platform.lower() not in entries or not identifier:
+                    sys.exit(f"❌ Expected twitter:<handle> or linkedin:<username>, got: {line}")
+                entries[platform.lower()].append(identifier)
+        added = sum(watchlist.add(platform, identifiers, WATCHLIST_HOURS) for platform, identifiers in entries.items())
+        print(f"👀 Watching {added} profiles for {WATCHLIST_HOURS:g}h ({len(watchlist.entries())} in total)")
+    if "--prefetch" in sys.argv:
+        runs = asyncio.run(prefetch_watchlist())
+        print(f"🔥 Prefetched the watchlist in {runs} actor runs")
+    if "--watch" in sys.argv or "--prefetch" in sys.argv:
+        sys.exit(0)
+
+    start_tracing()
+
+    if MCP_TRANSPORT == "stdio":
+        # stdout carries the MCP protocol; logs already go to stderr
+        asyncio.run(serve(transport="stdio"))
+        sys.exit(0)
+
     # Run HTTP server for ngrok deployment
     print("🚀 Starting Social Media Cold Outreach MCP Server on HTTP...")
-    print("📡 Server will be available at: http://localhost:8000/mcp")
-    print("🔗 Use ngrok to expose: ngrok http 8000")
+    print(f"📡 Server will be available at: http://localhost:{PORT}/mcp")
+    print(f"📈 Prometheus metrics at: http://localhost:{PORT}/metrics")
+    print(f"🔗 Use ngrok to expose: ngrok http {PORT}")
     print("🌐 Then give Le Chat: https://your-ngrok-url.ngrok.io/mcp")
     print("🔍 Debug mode enabled - will show all requests")
     print("\n📱 Available tools:")
     print("  - scrape_twitter_handles: Analyze Twitter/X profiles")
+    print("  - scrape_twitter_handles_batch: Analyze many Twitter/X profiles at once")
     print("  - scrape_linkedin_profile: Analyze LinkedIn profiles")
+    print("  - scrape_person: Analyze someone's Twitter/X and LinkedIn at once")
+    print("  - start_scrape / get_scrape_result: Run long scrapes as background jobs")
+    print("  - add_to_watchlist / get_watchlist: Prefetch people ahead of an event")
 
     try:
-        mcp.run(transport="http", host="0.0.0.0", port=8000, path="/mcp")
+        if MCP_WORKERS > 1:
+            if not CACHE_DB_PATH:
+                sys.exit("❌ MCP_WORKERS > 1 needs CACHE_DB_PATH set to a file the workers can share")
+            import uvicorn
+
+            print(f"👥 {MCP_WORKERS} worker processes sharing {CACHE_DB_PATH}")
+            uvicorn.run("main:create_worker_app", factory=True, host="0.0.0.0", port=PORT, workers=MCP_WORKERS,
+                        app_dir=os.path.dirname(os.path.abspath(__file__)))
+        else:
+            asyncio.run(serve(transport="http", host="0.0.0.0", port=PORT, path="/mcp"))
     except Exception as e:
         print(f"❌ Server error: {e}")
         raise
\ No newline at end of file
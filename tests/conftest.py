@@ -0,0 +1,68 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import pytest
+
+# Isolate the server from any local .env before it is imported: in-memory stores, no tracing,
+# one worker and no background prefetch
+os.environ.update(
+    APIFY_API_TOKEN="test-token",
+    CACHE_DB_PATH="",
+    WANDB_API_KEY="",
+    LOG_LEVEL="WARNING",
+    MCP_WORKERS="1",
+    WATCHLIST_POLL_SECS="0",
+)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+
+import main  # noqa: E402
+from fake_apify import FakeApify, create_app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def fake_apify_server():
+    """The local Apify stand-in, served from a background thread for the whole session."""
+    fake = FakeApify(run_latency=0.2, latency_jitter=0, retweet_rate=0)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(create_app(fake), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    yield fake, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join()
+
+
+@pytest.fixture
+def apify(fake_apify_server, monkeypatch):
+    """Fake Apify with no runs yet, and a server with a fresh client, cache and stores pointed at it."""
+    fake, url = fake_apify_server
+    fake.runs.clear()
+    fake.datasets.clear()
+    fake.recordings.clear()
+    fake.run_latency = 0.2
+    fake.error_rate = fake.fail_rate = 0.0
+    monkeypatch.setattr(main, "APIFY_API_URL", url)
+    monkeypatch.setattr(main, "_client", None)
+    monkeypatch.setattr(main, "result_cache", main.ResultCache(main.CACHE_MAX_ENTRIES))
+    monkeypatch.setattr(main, "inflight_scrapes", main.SingleFlight())
+    monkeypatch.setattr(main, "run_scheduler", main.RunScheduler(main.APIFY_MAX_CONCURRENT_RUNS, main.APIFY_MAX_QUEUED_RUNS))
+    monkeypatch.setattr(main, "actor_latency", main.LatencyTracker())
+    monkeypatch.setattr(main, "handle_index", main.HandleIndex())
+    monkeypatch.setattr(main, "last_seen", main.LastSeenStore())
+    monkeypatch.setattr(main, "job_store", main.JobStore())
+    monkeypatch.setattr(main, "watchlist", main.WatchlistStore())
+    return fake
+
+
+def actor_runs(fake: FakeApify, actor_id: str) -> list:
+    """Runs the fake has started for actor_id."""
+    return [run for run in list(fake.runs.values()) if run["actId"] == actor_id]
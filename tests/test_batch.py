@@ -0,0 +1,43 @@
+import asyncio
+import json
+
+import main
+from conftest import actor_runs
+from fake_apify import recording_key
+
+
+def tweet(handle: str, tweet_id: int, retweet: bool = False) -> dict:
+    return {
+        "text": f"Tweet {tweet_id} from @{handle}",
+        "url": f"https://x.com/{handle}/status/{tweet_id}",
+        "createdAt": "Mon Oct 12 10:00:00 +0000 2026",
+        "isRetweet": retweet,
+        "author": {"userName": handle},
+    }
+
+
+def test_batch_dataset_is_split_by_author(apify):
+    handles = ["ada", "grace", "linus"]
+    run_input = main.twitter_run_input(handles, max_items=3 * len(handles))
+    apify.recordings[recording_key(main.TWITTER_ACTOR_ID, run_input)] = [
+        tweet("ada", 1, retweet=True),
+        tweet("stranger", 2),
+        tweet("grace", 3),
+        tweet("ada", 4),
+        tweet("linus", 5, retweet=True),
+    ]
+    latest = asyncio.run(main.scrape_tweet_batch(handles))
+    assert latest["ada"]["url"].endswith("/4")  # The retweet before it is skipped
+    assert latest["grace"]["url"].endswith("/3")
+    assert latest["linus"]["url"].endswith("/5")  # Only retweets: the latest one is used
+    assert "stranger" not in latest
+
+
+def test_batch_tool_uses_one_run_for_all_handles(apify):
+    handles = ["ada", "grace", "linus"]
+    result = json.loads(asyncio.run(
+        main.scrape_twitter_handles_batch.fn(handles, compact=True, instructions="none")
+    ))
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
+    for handle in handles:
+        assert result["results"][handle]["latest_tweet"]["url"].startswith(f"https://x.com/{handle}/")
@@ -0,0 +1,68 @@
+import asyncio
+import json
+
+import main
+from conftest import actor_runs
+
+
+def scrape_twitter_handles(handle: str, **kwargs) -> dict:
+    return json.loads(asyncio.run(main.scrape_twitter_handles.fn(handle, compact=True, instructions="none", **kwargs)))
+
+
+def test_expired_entries_are_misses():
+    cache = main.ResultCache(max_entries=10)
+    cache.set("fresh", {"text": "hi"}, ttl=60)
+    cache.set("stale", {"text": "old"}, ttl=-1)
+    assert cache.get("fresh") == {"text": "hi"}
+    assert cache.get("stale") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = main.ResultCache(max_entries=2)
+    cache.set("a", {"n": 1}, ttl=60)
+    cache.set("b", {"n": 2}, ttl=60)
+    cache.get("a")
+    cache.set("c", {"n": 3}, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+
+
+def test_entries_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    main.ResultCache(max_entries=10, db_path=db_path).set("a", {"n": 1}, ttl=60)
+    assert main.ResultCache(max_entries=10, db_path=db_path).get("a") == {"n": 1}
+
+
+def test_repeat_lookup_is_served_from_cache(apify):
+    first = scrape_twitter_handles("ada")
+    second = scrape_twitter_handles("ada")
+    assert first["latest_tweet"] == second["latest_tweet"]
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
+
+
+def test_force_refresh_skips_cache(apify):
+    scrape_twitter_handles("ada")
+    scrape_twitter_handles("ada", force_refresh=True)
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 2
+
+
+def test_locked_database_does_not_fail_a_lookup(apify, monkeypatch, tmp_path):
+    db_path = str(tmp_path / "shared.db")
+    stores = {"result_cache": main.ResultCache(10, db_path), "handle_index": main.HandleIndex(db_path),
+              "last_seen": main.LastSeenStore(db_path)}
+    for name, store in stores.items():
+        store._db = main.open_db(db_path, timeout=0.1)
+        monkeypatch.setattr(main, name, store)
+
+    other_worker = main.open_db(db_path)
+    other_worker.execute("BEGIN IMMEDIATE")  # Another worker holds the write lock throughout the lookup
+    try:
+        first = scrape_twitter_handles("ada")
+        second = scrape_twitter_handles("ada")
+    finally:
+        other_worker.rollback()
+
+    assert first["latest_tweet"] == second["latest_tweet"]
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
+    assert main.last_seen.get("twitter", "ada") is None
@@ -0,0 +1,49 @@
+import asyncio
+import json
+import time
+
+import main
+from conftest import actor_runs
+
+
+def test_deadline_aborts_the_actor_run(apify):
+    apify.run_latency = 10
+
+    async def scrape():
+        result = await main.scrape_twitter_handles.fn("ada", deadline_secs=1, compact=True, instructions="none")
+        await asyncio.sleep(0.3)  # Let the abort request go out
+        return json.loads(result)
+
+    started = time.monotonic()
+    result = asyncio.run(scrape())
+    assert time.monotonic() - started < 5
+    assert "Deadline" in result["error"]
+    [run] = actor_runs(apify, main.TWITTER_ACTOR_ID)
+    assert run["status"] == "ABORTED"
+
+
+def test_run_within_deadline_is_not_aborted(apify):
+    result = json.loads(asyncio.run(
+        main.scrape_twitter_handles.fn("ada", deadline_secs=5, compact=True, instructions="none")
+    ))
+    assert "latest_tweet" in result
+    assert all(run["status"] != "ABORTED" for run in actor_runs(apify, main.TWITTER_ACTOR_ID))
+
+
+def test_failed_run_is_an_error_and_not_cached(apify):
+    apify.fail_rate = 1.0
+    failed = json.loads(asyncio.run(main.scrape_twitter_handles.fn("ada", compact=True, instructions="none")))
+    assert "FAILED" in failed["error"]
+
+    apify.fail_rate = 0.0
+    retried = json.loads(asyncio.run(main.scrape_twitter_handles.fn("ada", compact=True, instructions="none")))
+    assert "latest_tweet" in retried
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 2
+
+
+def test_failed_batch_run_is_an_error_per_handle(apify):
+    apify.fail_rate = 1.0
+    result = json.loads(asyncio.run(
+        main.scrape_twitter_handles_batch.fn(["ada", "grace"], compact=True, instructions="none")
+    ))
+    assert all("FAILED" in entry["error"] for entry in result["results"].values())
@@ -0,0 +1,27 @@
+import main
+
+POSTS = [
+    "Been really busy lately, but today we shipped robotics updates. Every other team would like this too. #robotics",
+    "Really proud of the robotics team here. Also been thinking about hiring, there is lots more to come.",
+    "Today's lesson: robotics hiring is hard. Every candidate asks about remote work. #robotics #hiring",
+]
+
+
+def digest(posts, **kwargs) -> dict:
+    post_digest = main.PostDigest(**kwargs)
+    for index, text in enumerate(posts):
+        post_digest.add({"text": text, "url": f"https://li/p/{index}", "engagement": {"comments": index}})
+    return post_digest.summary()
+
+
+def test_recurring_topics_skip_filler_words():
+    topics = [entry["topic"] for entry in digest(POSTS)["recurring_topics"]]
+    assert topics[0] == "robotics"
+    assert "hiring" in topics
+    assert not set(topics) & {"been", "really", "today", "lately", "every", "other", "also", "here", "there"}
+
+
+def test_top_posts_keep_highest_engagement():
+    summary = digest(POSTS, top_k=2)
+    assert summary["posts_analyzed"] == 3
+    assert [post["url"] for post in summary["top_posts"]] == ["https://li/p/2", "https://li/p/1"]
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+from conftest import actor_runs
+from fake_apify import recording_key
+
+
+def tweet(handle: str, tweet_id: int) -> dict:
+    return {
+        "text": f"Tweet {tweet_id} from @{handle}",
+        "url": f"https://x.com/{handle}/status/{tweet_id}",
+        "createdAt": "Mon Oct 12 10:00:00 +0000 2026",
+        "isRetweet": False,
+        "author": {"userName": handle, "name": handle.title()},
+    }
+
+
+def record(apify, handles, items) -> None:
+    run_input = main.twitter_run_input(handles, max_items=3 * len(handles) if len(handles) > 1 else 3)
+    apify.recordings[recording_key(main.TWITTER_ACTOR_ID, run_input)] = items
+
+
+def scrape_twitter_handles(handle: str, **kwargs) -> dict:
+    return json.loads(asyncio.run(main.scrape_twitter_handles.fn(handle, compact=True, instructions="none", **kwargs)))
+
+
+@pytest.mark.parametrize("raw", [
+    "ada", "@Ada", " ADA ", "https://x.com/ada", "x.com/Ada/", "https://twitter.com/@ada",
+    "https://mobile.twitter.com/ada/status/123", "www.x.com/ada",
+])
+def test_twitter_handles_and_urls_normalize_to_the_handle(raw):
+    assert main.normalize_twitter_handle(raw) == "ada"
+
+
+def test_names_normalize_to_a_guess():
+    assert main.normalize_twitter_handle("Ada Lovelace") == "adalovelace"
+    assert main.normalize_linkedin_username("https://www.linkedin.com/in/ada-lovelace/") == "ada-lovelace"
+
+
+def test_index_resolves_learned_aliases():
+    index = main.HandleIndex()
+    index.learn("twitter", ["Ada Lovelace", "https://x.com/AdaL"], "adal")
+    assert index.resolve("twitter", "ada  lovelace") == "adal"
+    assert index.resolve("twitter", "x.com/adal/") == "adal"
+    assert index.resolve("linkedin", "Ada Lovelace") is None
+
+
+def test_misses_expire_and_are_cleared_by_learning():
+    index = main.HandleIndex()
+    index.record_miss("twitter", "ghost")
+    index.record_miss("twitter", "gone", ttl=-1)
+    assert index.is_known_miss("twitter", "ghost")
+    assert not index.is_known_miss("twitter", "gone")
+    index.learn("twitter", [], "ghost")
+    assert not index.is_known_miss("twitter", "ghost")
+
+
+def test_lookup_learns_the_tweet_author(apify):
+    record(apify, ["adalovelace"], [tweet("AdaL", 1)])
+    first = scrape_twitter_handles("Ada Lovelace")
+    assert first["latest_tweet"]["author"]["username"] == "adal"
+    assert main.handle_index.resolve("twitter", "Ada Lovelace") == "adal"
+    assert scrape_twitter_handles("Ada Lovelace") == first  # Resolved to adal and served from the cache
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
+
+
+def test_profile_url_is_scraped_as_its_handle(apify):
+    record(apify, ["ada"], [tweet("ada", 1)])
+    assert scrape_twitter_handles("https://x.com/Ada")["latest_tweet"]["url"].endswith("/1")
+
+
+def test_empty_successful_run_is_a_known_miss(apify):
+    record(apify, ["ghost"], [])
+    assert scrape_twitter_handles("ghost")["error"] == "No tweets found for this handle"
+    assert "recent lookup" in scrape_twitter_handles("ghost")["error"]
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
+    scrape_twitter_handles("ghost", force_refresh=True)
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 2
+
+
+def test_failed_run_is_not_a_known_miss(apify):
+    record(apify, ["ghost"], [])
+    apify.fail_rate = 1.0
+    assert "FAILED" in scrape_twitter_handles("ghost")["error"]
+    assert not main.handle_index.is_known_miss("twitter", "ghost")
+
+
+def batch(handles) -> dict:
+    return json.loads(asyncio.run(
+        main.scrape_twitter_handles_batch.fn(handles, compact=True, instructions="none")
+    ))["results"]
+
+
+def test_handle_missing_from_a_complete_batch_is_a_known_miss(apify):
+    record(apify, ["ada", "ghost"], [tweet("ada", 1)])
+    results = batch(["ada", "ghost"])
+    assert results["ghost"]["error"] == "No tweets found for this handle"
+    assert main.handle_index.is_known_miss("twitter", "ghost")
+
+
+def test_handle_cut_off_by_the_batch_item_limit_is_not_a_miss(apify):
+    record(apify, ["ada", "grace"], [tweet("ada", i) for i in range(6)])
+    results = batch(["ada", "grace"])
+    assert "latest_tweet" in results["ada"]
+    assert "item limit" in results["grace"]["error"]
+    assert not main.handle_index.is_known_miss("twitter", "grace")
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+import main
+from conftest import actor_runs
+
+
+def samples(actor_id: str) -> list:
+    return list(main.actor_latency._samples.get(actor_id, ()))
+
+
+def test_successful_run_is_recorded(apify):
+    asyncio.run(main.run_lookup_actor("twitter", main.TWITTER_ACTOR_ID, "ada"))
+    assert len(samples(main.TWITTER_ACTOR_ID)) == 1
+
+
+def test_run_past_deadline_is_recorded(apify):
+    apify.run_latency = 5
+    with pytest.raises(main.DeadlineExceeded):
+        asyncio.run(main.within_deadline(1, lambda: main.run_lookup_actor("twitter", main.TWITTER_ACTOR_ID, "ada")))
+    [elapsed] = samples(main.TWITTER_ACTOR_ID)
+    assert 0.5 <= elapsed < 5
+
+
+def test_cancelled_run_is_recorded_as_lower_bound(apify):
+    apify.run_latency = 5
+
+    async def cancel_early():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(main.run_lookup_actor("twitter", main.TWITTER_ACTOR_ID, "ada"), 0.3)
+
+    asyncio.run(cancel_early())
+    [elapsed] = samples(main.TWITTER_ACTOR_ID)
+    assert 0.3 <= elapsed < 5
+
+
+def enable_hedging(monkeypatch, delay_secs: float) -> None:
+    monkeypatch.setitem(main.HEDGE_POLICY, "twitter", {
+        "enabled": True, "actor": main.TWITTER_ACTOR_ID, "percentile": 90, "delay_secs": delay_secs,
+    })
+
+
+async def lookup_then_change(apify, **changes):
+    """Look up a tweet, changing the fake's behaviour once the primary run has started."""
+    lookup = asyncio.ensure_future(main.lookup_latest_post("twitter", "ada"))
+    while not apify.runs:
+        await asyncio.sleep(0.01)
+    for name, value in changes.items():
+        setattr(apify, name, value)
+    result = await lookup
+    await asyncio.sleep(0.3)  # Let the loser's abort go out
+    return result
+
+
+def test_slow_primary_is_hedged_and_aborted(apify, monkeypatch):
+    enable_hedging(monkeypatch, delay_secs=0.3)
+    apify.run_latency = 10
+    result = asyncio.run(lookup_then_change(apify, run_latency=0.2))
+    assert result["url"].startswith("https://x.com/ada/")
+    runs = actor_runs(apify, main.TWITTER_ACTOR_ID)
+    assert len(runs) == 2
+    assert runs[0]["status"] == "ABORTED"
+
+
+def test_failed_primary_is_hedged(apify, monkeypatch):
+    enable_hedging(monkeypatch, delay_secs=10)
+    apify.fail_rate = 1.0
+    result = asyncio.run(lookup_then_change(apify, fail_rate=0.0))
+    assert result["url"].startswith("https://x.com/ada/")
+    assert [run["status"] for run in actor_runs(apify, main.TWITTER_ACTOR_ID)] == ["FAILED", "SUCCEEDED"]
+
+
+def test_fast_primary_is_not_hedged(apify, monkeypatch):
+    enable_hedging(monkeypatch, delay_secs=5)
+    assert asyncio.run(main.lookup_latest_post("twitter", "ada")) is not None
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 1
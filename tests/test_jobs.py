@@ -0,0 +1,83 @@
+import asyncio
+import json
+import time
+
+import main
+from conftest import actor_runs
+
+
+async def start_scrape(identifier: str) -> dict:
+    return json.loads(await main.start_scrape.fn("twitter", identifier))
+
+
+async def get_scrape_result(job_id: str, wait_secs: int = 0) -> dict:
+    return json.loads(await main.get_scrape_result.fn(job_id, wait_secs=wait_secs, compact=True, instructions="none"))
+
+
+def test_job_returns_latest_tweet(apify):
+    async def scrape():
+        job = await start_scrape("ada")
+        return await get_scrape_result(job["job_id"], wait_secs=5)
+
+    assert asyncio.run(scrape())["latest_tweet"]["url"].startswith("https://x.com/ada/")
+
+
+def test_jobs_hold_a_run_slot_until_their_run_finishes(apify, monkeypatch):
+    apify.run_latency = 0.5
+    monkeypatch.setattr(main, "run_scheduler", main.RunScheduler(budget=1, max_queued=0))
+
+    async def scrape():
+        first = await start_scrape("ada")
+        busy = await start_scrape("grace")
+        await asyncio.sleep(1)  # Long enough for the first run to finish and free its slot
+        after = await start_scrape("grace")
+        return first, busy, after
+
+    first, busy, after = asyncio.run(scrape())
+    assert "job_id" in first and "job_id" in after
+    assert busy["error"].startswith("Error: Server busy")
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 2
+
+
+def test_queued_job_returns_right_away_and_runs_once_a_slot_frees_up(apify, monkeypatch):
+    apify.run_latency = 0.3
+    monkeypatch.setattr(main, "run_scheduler", main.RunScheduler(budget=1, max_queued=1))
+
+    async def scrape():
+        first = await start_scrape("ada")
+        started = time.monotonic()
+        queued = await start_scrape("grace")
+        elapsed = time.monotonic() - started
+        waiting = await get_scrape_result(queued["job_id"])
+        results = [await get_scrape_result(job["job_id"], wait_secs=5) for job in (first, queued)]
+        return queued, elapsed, waiting, results
+
+    queued, elapsed, waiting, results = asyncio.run(scrape())
+    assert queued["status"] == "QUEUED" and elapsed < 0.2
+    assert waiting["status"] == "QUEUED"
+    assert all("latest_tweet" in result for result in results)
+    assert len(actor_runs(apify, main.TWITTER_ACTOR_ID)) == 2
+
+
+def test_detached_run_keeps_renewing_its_budget_lease(apify, monkeypatch, tmp_path):
+    apify.run_latency = 1
+    monkeypatch.setattr(main, "leases", main.LeaseStore(str(tmp_path / "leases.db")))
+    monkeypatch.setattr(main, "TOOL_DEADLINE_SECS", 0.3)  # Budget leases expire after 0.3s unless renewed
+
+    def budget_leases() -> int:
+        return main.leases._db.execute(
+            "SELECT COUNT(*) FROM leases WHERE name LIKE 'run:%' AND expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+
+    async def scrape():
+        job = await start_scrape("ada")
+        await asyncio.sleep(0.8)
+        during = budget_leases()
+        result = await get_scrape_result(job["job_id"], wait_secs=5)
+        await asyncio.sleep(0.1)
+        return during, result
+
+    during, result = asyncio.run(scrape())
+    assert during == 1
+    assert "latest_tweet" in result
+    assert budget_leases() == 0
@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import main
+from fake_apify import recording_key
+
+SEEN = "Mon Oct 12 10:00:00 +0000 2026"
+
+
+def tweet(handle: str, tweet_id: int, created_at: str = SEEN) -> dict:
+    return {
+        "text": f"Tweet {tweet_id} from @{handle}",
+        "url": f"https://x.com/{handle}/status/{tweet_id}",
+        "createdAt": created_at,
+        "isRetweet": False,
+        "author": {"userName": handle},
+    }
+
+
+def record(apify, run_input: dict, items: list) -> None:
+    apify.recordings[recording_key(main.TWITTER_ACTOR_ID, run_input)] = items
+
+
+def remember(handle: str, tweet_id: int) -> dict:
+    post = main.format_tweet(tweet(handle, tweet_id))
+    main.last_seen.record("twitter", handle, post["url"], post["created_at"], post)
+    return post
+
+
+def test_since_input_restricts_to_the_last_seen_day():
+    since = main.parse_post_time(SEEN)
+    assert main.twitter_since_input(main.twitter_run_input(["ada"]), since)["start"] == "2026-10-12"
+
+
+def test_refresh_asks_only_for_newer_tweets_and_falls_back_to_last_seen(apify):
+    stored = remember("ada", 1)
+    # Only the date-filtered input is recorded, so an unfiltered run would return generated tweets
+    record(apify, main.twitter_since_input(main.twitter_run_input(["ada"]), main.parse_post_time(SEEN)), [])
+    assert asyncio.run(main.lookup_latest_post("twitter", "ada")) == stored
+
+
+def test_newer_tweet_replaces_last_seen(apify):
+    remember("ada", 1)
+    newer = tweet("ada", 2, created_at="Tue Oct 13 10:00:00 +0000 2026")
+    record(apify, main.twitter_since_input(main.twitter_run_input(["ada"]), main.parse_post_time(SEEN)), [newer])
+    assert asyncio.run(main.lookup_latest_post("twitter", "ada"))["url"].endswith("/2")
+    assert main.last_seen.get("twitter", "ada")["post_id"].endswith("/2")
+
+
+def test_unfiltered_empty_run_is_not_masked_by_last_seen(apify):
+    remember("ada", 1)
+    assert asyncio.run(main.reconcile_last_seen("twitter", "ada", None)) is None
+    assert asyncio.run(main.reconcile_last_seen("twitter", "ada", None, since_filtered=True))["url"].endswith("/1")
+
+
+def test_batch_refresh_uses_last_seen(apify):
+    stored = {handle: remember(handle, index) for index, handle in enumerate(["ada", "grace"])}
+    run_input = main.twitter_run_input(["ada", "grace"], max_items=6)
+    record(apify, main.twitter_since_input(run_input, main.parse_post_time(SEEN)), [])
+    assert asyncio.run(main.scrape_tweet_batch(["ada", "grace"])) == stored
+
+
+def test_batch_without_history_for_every_handle_is_not_filtered(apify):
+    remember("ada", 1)
+    run_input = main.twitter_run_input(["ada", "grace"], max_items=6)
+    record(apify, run_input, [tweet("grace", 5)])
+    latest = asyncio.run(main.scrape_tweet_batch(["ada", "grace"]))
+    assert latest["ada"] is None  # Unfiltered run without ada's tweets: a real miss
+    assert latest["grace"]["url"].endswith("/5")
+
+
+def test_background_job_records_last_seen(apify):
+    async def scrape():
+        job = json.loads(await main.start_scrape.fn("twitter", "ada"))
+        return json.loads(await main.get_scrape_result.fn(job["job_id"], wait_secs=5, compact=True, instructions="none"))
+
+    result = asyncio.run(scrape())
+    assert main.last_seen.get("twitter", "ada")["post_id"] == result["latest_tweet"]["url"]
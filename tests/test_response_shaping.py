@@ -0,0 +1,41 @@
+import json
+
+import main
+
+LONG_POST = (
+    "We just closed our Series B: $40M to scale our robotics platform. "
+    "I want to thank the team and every customer who trusted our robotics platform early. "
+    + "Some filler sentence about nothing in particular really. " * 40
+    + "\n#robotics #ai"
+)
+
+
+def test_max_chars_bounds_response_and_keeps_salient_sentences():
+    payload = {"latest_post": {"text": LONG_POST, "url": "https://li/p/1", "platform": "linkedin"}}
+    body = main.LINKEDIN_RESPONSES.build(payload, compact=True, instructions="none", max_chars=400)
+    assert len(body) <= 400
+    text = json.loads(body)["latest_post"]["text"]
+    assert text.startswith("We just closed our Series B")
+    assert text.count("filler") <= 1  # Repeated sentences are kept at most once
+
+
+def test_max_chars_prunes_empty_fields():
+    post = {"text": "Short.", "url": "u", "likes": 0, "retweets": 3, "created_at": "", "platform": "twitter"}
+    body = main.TWITTER_RESPONSES.build({"latest_tweet": post}, compact=True, instructions="none", max_chars=1000)
+    assert json.loads(body)["latest_tweet"] == {"text": "Short.", "url": "u", "retweets": 3, "platform": "twitter"}
+
+
+def test_max_chars_keeps_texts_aligned_with_url_less_posts():
+    payload = {
+        "latest_post": {"text": "A" * 300 + ". Second sentence here.", "url": ""},
+        "digest": {"top_posts": [{"text": "Top post text.", "url": "https://x/1"}]},
+    }
+    shaped = json.loads(main.LINKEDIN_RESPONSES.build(payload, compact=True, instructions="none", max_chars=400))
+    assert shaped["latest_post"]["url"] == ""
+    assert "Second sentence here." in shaped["latest_post"]["text"]
+    assert shaped["digest"]["top_posts"][0]["text"] == "Top post text."
+
+
+def test_without_max_chars_response_is_unchanged():
+    payload = {"latest_tweet": {"text": "hi", "url": "u", "likes": 0, "platform": "twitter"}}
+    assert main.TWITTER_RESPONSES.build(payload, compact=True, instructions="none") == main.encode_json(payload, True)
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+import pytest
+
+import main
+
+
+def test_full_queue_fails_fast():
+    scheduler = main.RunScheduler(budget=1, max_queued=1)
+
+    async def fill():
+        await scheduler.acquire(main.TWITTER_ACTOR_ID)
+        queued = asyncio.ensure_future(scheduler.acquire(main.TWITTER_ACTOR_ID))
+        await asyncio.sleep(0)
+        with pytest.raises(main.ServerBusy):
+            await scheduler.acquire(main.TWITTER_ACTOR_ID)
+        scheduler.release(main.TWITTER_ACTOR_ID)
+        await queued
+
+    asyncio.run(fill())
+    assert scheduler.running == 1
+
+
+def test_waiting_runs_are_admitted_by_priority():
+    scheduler = main.RunScheduler(budget=1, max_queued=10)
+    admitted = []
+
+    async def run(priority: str):
+        await scheduler.acquire(main.TWITTER_ACTOR_ID, priority)
+        admitted.append(priority)
+        scheduler.release(main.TWITTER_ACTOR_ID)
+
+    async def contend():
+        await scheduler.acquire(main.TWITTER_ACTOR_ID)
+        waiting = [asyncio.ensure_future(run(priority)) for priority in ("prefetch", "batch", "interactive")]
+        await asyncio.sleep(0)
+        scheduler.release(main.TWITTER_ACTOR_ID)
+        await asyncio.gather(*waiting)
+
+    asyncio.run(contend())
+    assert admitted == ["interactive", "batch", "prefetch"]
+
+
+def test_tool_reports_server_busy(apify, monkeypatch):
+    monkeypatch.setattr(main, "run_scheduler", main.RunScheduler(budget=1, max_queued=0))
+
+    async def scrape_two():
+        return await asyncio.gather(*(
+            main.scrape_twitter_handles.fn(handle, compact=True, instructions="none") for handle in ("ada", "grace")
+        ))
+
+    results = [json.loads(result) for result in asyncio.run(scrape_two())]
+    assert sum("latest_tweet" in result for result in results) == 1
+    assert sum(result.get("error", "").startswith("Error: Server busy") for result in results) == 1
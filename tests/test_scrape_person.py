@@ -0,0 +1,29 @@
+import asyncio
+import json
+
+import main
+from conftest import actor_runs
+
+
+def scrape_person(**kwargs) -> dict:
+    return json.loads(asyncio.run(main.scrape_person.fn(compact=True, instructions="none", **kwargs)))
+
+
+def test_both_platforms_are_scraped(apify):
+    result = scrape_person(name="Ada Lovelace", twitterHandle="ada", linkedinUsername="ada-lovelace")
+    assert "latest_tweet" in result["twitter"]
+    assert "latest_post" in result["linkedin"]
+
+
+def test_platform_without_identifier_is_skipped(apify):
+    result = scrape_person(name="", linkedinUsername="ada-lovelace")
+    assert result["twitter"] == {"error": "No identifier provided"}
+    assert "latest_post" in result["linkedin"]
+    assert actor_runs(apify, main.TWITTER_ACTOR_ID) == []
+
+
+def test_blank_identifier_is_skipped(apify):
+    result = scrape_person(name="  ", twitterHandle="ada")
+    assert "latest_tweet" in result["twitter"]
+    assert result["linkedin"] == {"error": "No identifier provided"}
+    assert actor_runs(apify, main.LINKEDIN_ACTOR_ID) == []
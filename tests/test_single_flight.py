@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import main
+from conftest import actor_runs
+
+
+def coalesced(source: str) -> float:
+    return main.metrics._series["mcp_coalesced_runs_total"].get((("source", source),), 0)
+
+
+def test_concurrent_calls_share_one_run():
+    flight = main.SingleFlight()
+    joined = coalesced("worker")
+    calls = []
+
+    async def scrape():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return {"text": "hi"}
+
+    async def both():
+        return await asyncio.gather(flight.run("key", scrape), flight.run("key", scrape))
+
+    assert asyncio.run(both()) == [{"text": "hi"}, {"text": "hi"}]
+    assert len(calls) == 1
+    assert flight.saved == 1
+    assert coalesced("worker") == joined + 1
+
+
+def test_workers_share_one_run_through_leases(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "LEASE_POLL_SECS", 0.02)
+    db_path = str(tmp_path / "leases.db")
+    workers = [main.SingleFlight(main.LeaseStore(db_path)), main.SingleFlight(main.LeaseStore(db_path))]
+    joined = coalesced("peer")
+    calls = []
+
+    async def scrape():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return {"text": "hi"}
+
+    async def both():
+        return await asyncio.gather(*(worker.run("key", scrape) for worker in workers))
+
+    assert asyncio.run(both()) == [{"text": "hi"}, {"text": "hi"}]
+    assert len(calls) == 1
+    assert sum(worker.saved for worker in workers) == 1
+    assert coalesced("peer") == joined + 1
+
+
+def test_waiting_worker_only_reads_a_held_lease(tmp_path):
+    db_path = str(tmp_path / "leases.db")
+    holder, waiter = main.LeaseStore(db_path), main.LeaseStore(db_path)
+    assert not waiter.held("key")
+    assert holder.acquire("key", 60)
+    assert waiter.held("key")
+    assert waiter.finished_result("key") is None
+    holder.release("key", '{"text": "hi"}', keep_secs=10)
+    assert waiter.finished_result("key") == '{"text": "hi"}'
+
+
+def scrape_twitter_handles(handle: str, deadline_secs: float):
+    return main.scrape_twitter_handles.fn(handle, deadline_secs=deadline_secs, compact=True, instructions="none")
+
+
+def test_joiner_keeps_its_own_deadline(apify):
+    apify.run_latency = 2
+
+    async def scrape():
+        return await asyncio.gather(scrape_twitter_handles("ada", 1), scrape_twitter_handles("ada", 30))
+
+    leader, joiner = (json.loads(result) for result in asyncio.run(scrape()))
+    assert "Deadline" in leader["error"]
+    assert "latest_tweet" in joiner
+    [run] = actor_runs(apify, main.TWITTER_ACTOR_ID)
+    assert run["status"] == "SUCCEEDED"
+
+
+def test_shared_run_is_aborted_once_every_caller_gave_up(apify):
+    apify.run_latency = 10
+
+    async def scrape():
+        results = await asyncio.gather(scrape_twitter_handles("ada", 0.5), scrape_twitter_handles("ada", 1))
+        await asyncio.sleep(0.3)  # Let the abort request go out
+        return results
+
+    assert all("Deadline" in json.loads(result)["error"] for result in asyncio.run(scrape()))
+    [run] = actor_runs(apify, main.TWITTER_ACTOR_ID)
+    assert run["status"] == "ABORTED"
@@ -0,0 +1,52 @@
+import asyncio
+import json
+
+import main
+from conftest import actor_runs
+from fake_apify import recording_key
+
+
+def watch(twitter=(), linkedin=()) -> None:
+    main.watchlist.add("twitter", list(twitter), hours=1)
+    main.watchlist.add("linkedin", list(linkedin), hours=1)
+
+
+def statuses() -> dict:
+    return {entry["identifier"]: entry["last_status"] for entry in main.watchlist.entries()}
+
+
+def test_prefetch_warms_the_cache_and_records_each_outcome(apify, monkeypatch):
+    monkeypatch.setattr(main, "WATCHLIST_RUNS_PER_MINUTE", 6000)
+    ghost_run_input = main.twitter_run_input(["ada", "ghost"], max_items=6)
+    apify.recordings[recording_key(main.TWITTER_ACTOR_ID, ghost_run_input)] = [{
+        "text": "Tweet 1 from @ada",
+        "url": "https://x.com/ada/status/1",
+        "createdAt": "Mon Oct 12 10:00:00 +0000 2026",
+        "isRetweet": False,
+        "author": {"userName": "ada", "name": "Ada"},
+    }]
+    watch(twitter=["ada", "ghost"], linkedin=["grace-hopper"])
+
+    assert asyncio.run(main.prefetch_watchlist()) == 2
+    assert statuses() == {"ada": "ok", "ghost": "miss", "grace-hopper": "ok"}
+    assert asyncio.run(main.prefetch_watchlist()) == 0  # Nothing is due again yet
+
+    runs = len(apify.runs)
+    response = json.loads(asyncio.run(main.scrape_twitter_handles.fn("ada", compact=True, instructions="none")))
+    assert response["latest_tweet"]["url"].endswith("/1")
+    assert len(apify.runs) == runs
+
+
+def test_handle_missing_from_the_batch_counts_as_an_error(apify, monkeypatch):
+    monkeypatch.setattr(main, "WATCHLIST_RUNS_PER_MINUTE", 6000)
+
+    async def fetch_latest_tweets(handles, force_refresh=False, deadline_secs=None):
+        return {}
+
+    monkeypatch.setattr(main, "fetch_latest_tweets", fetch_latest_tweets)
+    watch(twitter=["ada"])
+
+    asyncio.run(main.prefetch_watchlist())
+    assert statuses() == {"ada": "error"}
+    assert main.watchlist.due() == [("twitter", "ada")]  # Retried on the next pass
+    assert not actor_runs(apify, main.TWITTER_ACTOR_ID)